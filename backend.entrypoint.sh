@@ -38,6 +38,20 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
-python manage.py rqworker default &
+# RQ_WORKERS > 1 zusammen mit HLS_TRANSCODE_MODE=fanout verteilt die Auflösungen
+# eines Videos auf mehrere Worker.
+for _ in $(seq "${RQ_WORKERS:-1}"); do
+  python manage.py rqworker default --with-scheduler &
+done
+
+# SERVER_MODE=asgi startet uvicorn mit den async HLS-Views (HLS_ASYNC_VIEWS=True),
+# sonst laufen die synchronen gunicorn-Worker wie bisher.
+# Persistente DB-Verbindungen sind unter ASGI pro Thread und werden nicht
+# wiederverwendet, daher DB_CONN_MAX_AGE=0.
+if [ "$SERVER_MODE" = "asgi" ]; then
+  export HLS_ASYNC_VIEWS=True
+  export DB_CONN_MAX_AGE=0
+  exec uvicorn core.asgi:application --host 0.0.0.0 --port 8000 --workers "${WEB_CONCURRENCY:-4}"
+fi
 
 exec gunicorn core.wsgi:application --bind 0.0.0.0:8000 --reload
@@ -0,0 +1,38 @@
+"""
+PostgreSQL backend with connection instrumentation.
+Logs how long it takes to acquire a new connection (a fresh connect, or a
+checkout when the psycopg pool is enabled) and counts the queries of the
+current request for QueryBudgetMiddleware.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db.backends.postgresql import base
+
+logger = logging.getLogger(__name__)
+
+# List holding the query count of the current request, None outside of requests.
+query_count = ContextVar('query_count', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.execute_wrappers.append(count_queries)
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        elapsed = (time.perf_counter() - start) * 1000
+        level = logging.WARNING if elapsed > settings.DB_SLOW_CONNECT_MS else logging.DEBUG
+        logger.log(level, f"Acquired database connection for '{self.alias}' in {elapsed:.1f} ms")
+        return connection
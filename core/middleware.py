@@ -0,0 +1,44 @@
+import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from core.db_backend.base import query_count
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """
+    Warn when a request runs more than DB_QUERY_BUDGET database queries.
+    Queries are counted by the database backend, so this works without DEBUG
+    and for async views that query through sync_to_async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = query_count.set([0])
+        try:
+            return self.get_response(request)
+        finally:
+            self.check_budget(request, query_count.get()[0])
+            query_count.reset(token)
+
+    async def __acall__(self, request):
+        token = query_count.set([0])
+        try:
+            return await self.get_response(request)
+        finally:
+            self.check_budget(request, query_count.get()[0])
+            query_count.reset(token)
+
+    def check_budget(self, request, count):
+        budget = settings.DB_QUERY_BUDGET
+        if budget and count > budget:
+            logger.warning(f"{request.method} {request.path} ran {count} queries (budget {budget})")
@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import timedelta
+from importlib.util import find_spec
 
 load_dotenv()
 
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'django_rq',
     'rest_framework',
@@ -44,6 +46,7 @@ MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,16 +75,34 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds and health-checked before
+# reuse. DB_POOL=True uses the psycopg pool instead; opt-in, it needs psycopg[binary,pool] 3,
+# which requirements.txt does not install.
+DB_POOL = os.environ.get("DB_POOL", "False").lower() == "true"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db_backend",
         "NAME": os.environ.get("DB_NAME", default="videoflix_db"),
         "USER": os.environ.get("DB_USER", default="videoflix_user"),
         "PASSWORD": os.environ.get("DB_PASSWORD", default="supersecretpassword"),
         "HOST": os.environ.get("DB_HOST", default="db"),
-        "PORT": os.environ.get("DB_PORT", default=5432)
+        "PORT": os.environ.get("DB_PORT", default=5432),
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", default=60)),
+        "CONN_HEALTH_CHECKS": os.environ.get("DB_CONN_HEALTH_CHECKS", "True").lower() == "true",
+        "OPTIONS": {
+            "pool": {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", default=2)),
+                "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", default=10)),
+                "timeout": float(os.environ.get("DB_POOL_TIMEOUT", default=10)),
+            },
+        } if DB_POOL else {},
     }
 }
+# Log connection acquire times above this as warnings, and warn about requests
+# with more queries than DB_QUERY_BUDGET (0 disables the check).
+DB_SLOW_CONNECT_MS = float(os.environ.get("DB_SLOW_CONNECT_MS", default=100))
+DB_QUERY_BUDGET = int(os.environ.get("DB_QUERY_BUDGET", default=20))
 
 CACHES = {
     "default": {
@@ -104,6 +125,95 @@ RQ_QUEUES = {
     },
 }
 
+# HLS transcoding
+# 'single' encodes all renditions in one job and one ffmpeg pass, 'fanout' queues
+# one job per rendition so several RQ workers (RQ_WORKERS, or several nodes) share a video.
+HLS_TRANSCODE_MODE = os.environ.get("HLS_TRANSCODE_MODE", default="single")
+# Job timeout in seconds per second of source and rendition, but at least the minimum.
+HLS_TRANSCODE_TIMEOUT_FACTOR = float(os.environ.get("HLS_TRANSCODE_TIMEOUT_FACTOR", default=5))
+HLS_TRANSCODE_MIN_TIMEOUT = int(os.environ.get("HLS_TRANSCODE_MIN_TIMEOUT", default=900))
+# Failed or abandoned transcode jobs are retried after these delays in seconds
+# (needs workers started with --with-scheduler); finished renditions are skipped.
+TRANSCODE_RETRY_INTERVALS = [
+    int(delay) for delay in os.environ.get("TRANSCODE_RETRY_INTERVALS", default="30,120,600").split(",") if delay
+]
+# Live progress in the cache: written at most every TRANSCODE_PROGRESS_INTERVAL seconds;
+# status streams (server-sent events, async views only) close after TRANSCODE_STATUS_STREAM_TIMEOUT.
+TRANSCODE_PROGRESS_INTERVAL = float(os.environ.get("TRANSCODE_PROGRESS_INTERVAL", default=1))
+TRANSCODE_PROGRESS_TTL = int(os.environ.get("TRANSCODE_PROGRESS_TTL", default=86400))
+TRANSCODE_STDERR_LINES = int(os.environ.get("TRANSCODE_STDERR_LINES", default=50))
+TRANSCODE_STATUS_STREAM_TIMEOUT = int(os.environ.get("TRANSCODE_STATUS_STREAM_TIMEOUT", default=300))
+# Sources of at least TRANSCODE_CHUNKED_MIN_DURATION seconds (0 = never) are cut at
+# keyframes into TRANSCODE_CHUNK_SECONDS pieces, encoded by TRANSCODE_CHUNK_WORKERS processes.
+TRANSCODE_CHUNKED_MIN_DURATION = int(os.environ.get("TRANSCODE_CHUNKED_MIN_DURATION", default=1200))
+TRANSCODE_CHUNK_SECONDS = int(os.environ.get("TRANSCODE_CHUNK_SECONDS", default=60))
+TRANSCODE_CHUNK_WORKERS = int(os.environ.get("TRANSCODE_CHUNK_WORKERS", default=os.cpu_count() or 1))
+
+# HLS delivery
+# 'stream' streams from disk (sendfile under gunicorn), 'accel-redirect' and
+# 'x-sendfile' hand the file over to the front proxy.
+HLS_DELIVERY_BACKEND = os.environ.get("HLS_DELIVERY_BACKEND", default="stream")
+HLS_STREAM_CHUNK_SIZE = int(os.environ.get("HLS_STREAM_CHUNK_SIZE", default=64 * 1024))
+HLS_ACCEL_REDIRECT_PREFIX = os.environ.get("HLS_ACCEL_REDIRECT_PREFIX", default="/protected-media/")
+# Route manifests and segments to the async views (use together with SERVER_MODE=asgi).
+HLS_ASYNC_VIEWS = os.environ.get("HLS_ASYNC_VIEWS", "False").lower() == "true"
+# Segments never change once written; VOD manifests only change on re-processing.
+HLS_SEGMENT_CACHE_CONTROL = os.environ.get("HLS_SEGMENT_CACHE_CONTROL", default="private, max-age=31536000, immutable")
+HLS_MANIFEST_CACHE_CONTROL = os.environ.get("HLS_MANIFEST_CACHE_CONTROL", default="private, max-age=10")
+# In-process manifest cache: max entries per worker and seconds between mtime checks.
+HLS_MANIFEST_CACHE_SIZE = int(os.environ.get("HLS_MANIFEST_CACHE_SIZE", default=512))
+HLS_MANIFEST_CACHE_REVALIDATE = float(os.environ.get("HLS_MANIFEST_CACHE_REVALIDATE", default=5))
+# Node-wide hot segment cache on a tmpfs shared by all workers (empty = disabled).
+# Policy is 'lru' or 'lfu'; PREFETCH is the number of following segments to load ahead.
+HLS_SEGMENT_CACHE_DIR = os.environ.get("HLS_SEGMENT_CACHE_DIR", default="")
+HLS_SEGMENT_CACHE_BYTES = int(os.environ.get("HLS_SEGMENT_CACHE_BYTES", default=512 * 1024 * 1024))
+HLS_SEGMENT_CACHE_POLICY = os.environ.get("HLS_SEGMENT_CACHE_POLICY", default="lru")
+HLS_SEGMENT_CACHE_PREFETCH = int(os.environ.get("HLS_SEGMENT_CACHE_PREFETCH", default=3))
+HLS_SEGMENT_CACHE_WORKERS = int(os.environ.get("HLS_SEGMENT_CACHE_WORKERS", default=2))
+HLS_SEGMENT_CACHE_STATS_INTERVAL = float(os.environ.get("HLS_SEGMENT_CACHE_STATS_INTERVAL", default=5))
+# Signed segment URLs in manifests; the TTL has to cover a full playback session.
+HLS_SIGNED_URLS = os.environ.get("HLS_SIGNED_URLS", "True").lower() == "true"
+HLS_SIGNED_URL_TTL = int(os.environ.get("HLS_SIGNED_URL_TTL", default=6 * 60 * 60))
+# Video id -> HLS directory lookup: per-process TTL, Redis TTL and TTL for unknown ids (seconds).
+VIDEO_LOCATION_LOCAL_TTL = float(os.environ.get("VIDEO_LOCATION_LOCAL_TTL", default=5))
+VIDEO_LOCATION_LOCAL_SIZE = int(os.environ.get("VIDEO_LOCATION_LOCAL_SIZE", default=10000))
+VIDEO_LOCATION_SHARED_TTL = int(os.environ.get("VIDEO_LOCATION_SHARED_TTL", default=3600))
+VIDEO_LOCATION_NEGATIVE_TTL = int(os.environ.get("VIDEO_LOCATION_NEGATIVE_TTL", default=30))
+
+# Catalog: keyset pagination with ?page_size= and ?cursor= (the plain list stays the default).
+CATALOG_PAGE_SIZE = int(os.environ.get("CATALOG_PAGE_SIZE", default=24))
+CATALOG_MAX_PAGE_SIZE = int(os.environ.get("CATALOG_MAX_PAGE_SIZE", default=100))
+# Rendered catalog in the shared cache, keyed by a version that every Video change bumps.
+CATALOG_CACHE_TTL = int(os.environ.get("CATALOG_CACHE_TTL", default=3600))
+CATALOG_CACHE_LOCK_TIMEOUT = float(os.environ.get("CATALOG_CACHE_LOCK_TIMEOUT", default=10))
+CATALOG_CACHE_CONTROL = os.environ.get("CATALOG_CACHE_CONTROL", default="private, no-cache")
+# Home screen rows: newest videos per category.
+CATALOG_ROWS_PER_CATEGORY = int(os.environ.get("CATALOG_ROWS_PER_CATEGORY", default=10))
+CATALOG_ROWS_MAX_PER_CATEGORY = int(os.environ.get("CATALOG_ROWS_MAX_PER_CATEGORY", default=50))
+# Search: default and maximum number of results.
+SEARCH_RESULTS_LIMIT = int(os.environ.get("SEARCH_RESULTS_LIMIT", default=20))
+SEARCH_RESULTS_MAX_LIMIT = int(os.environ.get("SEARCH_RESULTS_MAX_LIMIT", default=100))
+# Delta sync: how long tombstones are kept (older cursors get 410) and how far
+# the returned cursor lags behind, so late-committing writes are not missed.
+DELTA_SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("DELTA_SYNC_TOMBSTONE_RETENTION_DAYS", default=30))
+DELTA_SYNC_SAFETY_WINDOW = int(os.environ.get("DELTA_SYNC_SAFETY_WINDOW", default=10))
+# Thumbnail ladder widths (16:9) and encoder quality. The default width is also
+# stored as thumbnail_image for clients that do not use the srcset.
+THUMBNAIL_WIDTHS = [int(width) for width in os.environ.get("THUMBNAIL_WIDTHS", default="320,640,1280,1920").split(",")]
+THUMBNAIL_DEFAULT_WIDTH = int(os.environ.get("THUMBNAIL_DEFAULT_WIDTH", default=640))
+THUMBNAIL_QUALITY = {
+    "webp": int(os.environ.get("THUMBNAIL_WEBP_QUALITY", default=80)),
+    "jpeg": int(os.environ.get("THUMBNAIL_JPEG_QUALITY", default=85)),
+}
+# Trick-play sprites: one frame every TRICKPLAY_INTERVAL seconds, TRICKPLAY_WIDTH
+# pixels wide, tiled COLUMNS x ROWS per sheet.
+TRICKPLAY_INTERVAL = int(os.environ.get("TRICKPLAY_INTERVAL", default=10))
+TRICKPLAY_WIDTH = int(os.environ.get("TRICKPLAY_WIDTH", default=160))
+TRICKPLAY_COLUMNS = int(os.environ.get("TRICKPLAY_COLUMNS", default=5))
+TRICKPLAY_ROWS = int(os.environ.get("TRICKPLAY_ROWS", default=5))
+TRICKPLAY_QUALITY = int(os.environ.get("TRICKPLAY_QUALITY", default=70))
+TRICKPLAY_CACHE_CONTROL = os.environ.get("TRICKPLAY_CACHE_CONTROL", default="private, max-age=3600")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -168,6 +278,12 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed JSON; MessagePack for Accept: application/msgpack when installed.
+    'DEFAULT_RENDERER_CLASSES': [
+        'videoflix_app.api.renderers.FastJSONRenderer',
+        *(['videoflix_app.api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 SIMPLE_JWT = {
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Profile, Video
+from .search import filter_videos
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
@@ -14,5 +15,11 @@ class VideoAdmin(admin.ModelAdmin):
     list_filter = ['category', 'created_at']
     search_fields = ['title', 'description']
     readonly_fields = ['created_at']
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Use the full-text and trigram indexes instead of ILIKE scans"""
+        if not search_term.strip():
+            return queryset, False
+        return filter_videos(queryset, search_term), False
 
 # Register your models here.
@@ -0,0 +1,167 @@
+"""
+Async variants of the HLS delivery and status stream views for running under an ASGI server.
+They are plain Django async views (DRF views are sync only) and stream files
+in chunks with thread-offloaded reads, so a slow client does not hold a worker.
+Enabled with the HLS_ASYNC_VIEWS setting.
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from auth_app.authentication import CookieJWTAuthentication
+from videoflix_app.cache import load_manifest, manifest_cache, video_locations
+from videoflix_app.delivery import aserve_file, serve_bytes
+from videoflix_app.models import Video
+from videoflix_app.progress import StatusStream
+from videoflix_app.segment_cache import segment_cache
+from videoflix_app.signing import signed_manifest, verify_segment_token
+from videoflix_app.tasks import RENDITIONS
+from videoflix_app.trickplay import CONTENT_TYPES as TRICKPLAY_CONTENT_TYPES, TRICKPLAY_DIR
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+RENDITION_NAMES = [res['name'] for res in RENDITIONS]
+
+
+async def authenticate(request):
+    """Return the authenticated user of the request or None"""
+    result = await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+    return result[0] if result else None
+
+
+async def get_video_location(movie_id):
+    """Resolve the HLS directory, hitting the database thread only on a local cache miss"""
+    found, location = video_locations.get_local(movie_id)
+    if found:
+        return location
+    return await sync_to_async(video_locations.get)(movie_id)
+
+
+def internal_error(message, error):
+    """JSON 500 like the DRF views return, with the error logged"""
+    logger.error(f"{message}: {error}")
+    return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+async def serve_segment(request, movie_id, resolution, segment):
+    try:
+        hls_dir = await get_video_location(movie_id)
+        if hls_dir is None:
+            return JsonResponse({'error': 'Video not found'}, status=404)
+
+        segment_path = os.path.join(settings.MEDIA_ROOT, hls_dir, resolution, segment)
+        segment_path = await asyncio.to_thread(segment_cache.lookup, movie_id, segment_path)
+        return await aserve_file(request, segment_path, 'video/MP2T', settings.HLS_SEGMENT_CACHE_CONTROL)
+    except (FileNotFoundError, NotADirectoryError):
+        return JsonResponse({'error': 'Video segment not found'}, status=404)
+    except Exception as e:
+        return internal_error(f"Error serving segment {segment} of video {movie_id}", e)
+
+
+@require_safe
+async def hls_manifest(request, movie_id, resolution):
+    """
+    Async HLS manifest delivery.
+    Requires JWT authentication.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    try:
+        entry = manifest_cache.get((movie_id, resolution))
+        if entry is None:
+            entry = await sync_to_async(load_manifest)(movie_id, resolution)
+        segment_cache.prefetch_playlist(movie_id, entry.path, entry.content)
+
+        content, etag, last_modified = signed_manifest(entry, user.id, movie_id)
+        return serve_bytes(
+            request,
+            content,
+            'application/vnd.apple.mpegurl',
+            etag,
+            last_modified,
+            settings.HLS_MANIFEST_CACHE_CONTROL
+        )
+    except Video.DoesNotExist:
+        return JsonResponse({'error': 'Video not found'}, status=404)
+    except FileNotFoundError:
+        return JsonResponse({'error': 'Video manifest not found'}, status=404)
+    except Exception as e:
+        return internal_error(f"Error serving {resolution} manifest of video {movie_id}", e)
+
+
+@require_safe
+async def hls_segment(request, movie_id, resolution, segment):
+    """
+    Async HLS segment delivery.
+    Requires JWT authentication.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    return await serve_segment(request, movie_id, resolution, segment)
+
+
+@require_safe
+async def hls_signed_segment(request, movie_id, resolution, token, segment):
+    """
+    Async HLS segment delivery for signed segment URLs.
+    Only the URL signature is verified.
+    """
+    if verify_segment_token(token, movie_id) is None:
+        return JsonResponse({'error': 'Invalid or expired segment signature'}, status=403)
+    return await serve_segment(request, movie_id, resolution, segment)
+
+
+@require_safe
+async def trickplay(request, movie_id, filename):
+    """
+    Async trick-play delivery (thumbnails.vtt and sprite sheets).
+    Requires JWT authentication.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    try:
+        content_type = TRICKPLAY_CONTENT_TYPES.get(os.path.splitext(filename)[1])
+        hls_dir = await get_video_location(movie_id)
+        if content_type is None or hls_dir is None:
+            return JsonResponse({'error': 'Trick-play file not found'}, status=404)
+
+        path = os.path.join(settings.MEDIA_ROOT, hls_dir, TRICKPLAY_DIR, filename)
+        return await aserve_file(request, path, content_type, settings.TRICKPLAY_CACHE_CONTROL)
+    except (FileNotFoundError, NotADirectoryError):
+        return JsonResponse({'error': 'Trick-play file not found'}, status=404)
+    except Exception as e:
+        return internal_error(f"Error serving trick-play file {filename} of video {movie_id}", e)
+
+
+@require_safe
+async def video_status_stream(request, movie_id):
+    """
+    Async processing status as server-sent events.
+    Requires JWT authentication.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    stream = StatusStream(movie_id, RENDITION_NAMES)
+
+    async def events():
+        while True:
+            chunk, done = await sync_to_async(stream.step)()
+            yield chunk
+            if done:
+                return
+            await asyncio.sleep(settings.TRANSCODE_PROGRESS_INTERVAL)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,85 @@
+import base64
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class VideoCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+    The cursor encodes the last row of a page, so every page is one index range
+    scan no matter how deep the client scrolls, and inserts never shift pages.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def is_requested(self, request):
+        """Pagination is opt-in so existing clients keep getting the full list"""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def encode_cursor(self, created_at, pk):
+        timestamp = (created_at - EPOCH) // timedelta(microseconds=1)
+        return base64.urlsafe_b64encode(f'{timestamp}.{pk}'.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            timestamp, pk = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii').split('.')
+            created_at = EPOCH + timedelta(microseconds=int(timestamp))
+            return created_at, int(pk)
+        except (ValueError, UnicodeError, OverflowError):
+            raise ValidationError({'error': 'Invalid cursor.'})
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, settings.CATALOG_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'error': 'Invalid page size.'})
+        return max(1, min(page_size, settings.CATALOG_MAX_PAGE_SIZE))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by('-created_at', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            # created_at__lte bounds the index scan; the OR alone is only a filter,
+            # which Postgres would apply while walking the index from the newest row.
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at),
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+            )
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_cursor = self.encode_cursor(*self.row_key(page[-1])) if self.has_next else None
+        return page
+
+    def row_key(self, row):
+        """Return (created_at, id) of a model instance or a .values() row"""
+        if isinstance(row, dict):
+            return row['created_at'], row['id']
+        return row.created_at, row.pk
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
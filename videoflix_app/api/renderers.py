@@ -0,0 +1,58 @@
+"""
+Faster renderers for the REST API, chosen by content negotiation.
+Both encode datetimes, decimals and other non-JSON types through DRF's
+JSONEncoder, so those values come out as with DRF's JSONRenderer. The JSON
+documents are equal, but not always byte for byte: orjson writes floats in
+exponent notation as 1e16 or 1.5e-7 where the stdlib writes 1e+16 or 1.5e-07.
+orjson and msgpack are optional: without orjson, FastJSONRenderer behaves
+like JSONRenderer; without msgpack, MessagePackRenderer is not enabled.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson.
+    Falls back to the stdlib encoder for indented output, for non-default
+    JSON settings and for data orjson cannot encode (e.g. non-string keys).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping of U+2028 and U+2029 as JSONRenderer.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderer for clients that send Accept: application/msgpack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True, datetime=False)
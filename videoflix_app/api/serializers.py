@@ -1,17 +1,34 @@
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
 from videoflix_app.models import Video
 
+VIDEO_LIST_FIELDS = (
+    'id', 'created_at', 'title', 'description', 'category', 'thumbnail_image', 'thumbnail_url', 'thumbnail_variants',
+    'duration'
+)
+
+
+def build_srcset(variants, url):
+    """Return {'webp': '<url> 320w, <url> 640w, ...', 'jpeg': ...} for a thumbnail variant set"""
+    srcset = {}
+    for variant in sorted(variants or [], key=lambda variant: variant['width']):
+        entry = f"{url(variant['path'])} {variant['width']}w"
+        srcset[variant['format']] = f"{srcset[variant['format']]}, {entry}" if variant['format'] in srcset else entry
+    return srcset
+
 class VideoSerializer(serializers.ModelSerializer):
     """
     Serializer for Video model.
     Returns video metadata exactly as specified in API documentation.
     """
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnail_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Video
-        fields = ['id', 'created_at', 'title', 'description', 'thumbnail_url', 'category']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'created_at', 'title', 'description', 'thumbnail_url', 'thumbnail_srcset', 'category', 'duration']
+        read_only_fields = ['id', 'created_at', 'duration']
     
     def get_thumbnail_url(self, obj):
         """Return absolute thumbnail URL for cross-origin requests"""
@@ -22,3 +39,51 @@ class VideoSerializer(serializers.ModelSerializer):
             else:
                 return f"http://127.0.0.1:8000{obj.thumbnail_image.url}"
         return obj.thumbnail_url or ''
+    
+    def get_thumbnail_srcset(self, obj):
+        """Return absolute srcset strings of the thumbnail ladder per image format"""
+        storage = obj.thumbnail_image.storage
+        request = self.context.get('request')
+        if request:
+            return build_srcset(obj.thumbnail_variants, lambda path: request.build_absolute_uri(storage.url(path)))
+        return build_srcset(obj.thumbnail_variants, lambda path: f"http://127.0.0.1:8000{storage.url(path)}")
+
+
+def serialize_video_list(rows, request=None):
+    """
+    Fast path for VideoSerializer(many=True) on the catalog.
+    Takes rows of Video.objects.values(*VIDEO_LIST_FIELDS) and builds the same
+    dicts without model instances or serializer fields. The absolute media URL
+    prefix is computed once instead of per row.
+    """
+    to_datetime = serializers.DateTimeField().to_representation
+    storage = Video._meta.get_field('thumbnail_image').storage
+
+    if isinstance(storage, FileSystemStorage):
+        media_url = storage.url('')
+        if request:
+            media_url = request.build_absolute_uri(media_url)
+        else:
+            media_url = f"http://127.0.0.1:8000{media_url}"
+
+        def thumbnail_url(name):
+            return media_url + filepath_to_uri(name).lstrip('/')
+    else:
+        def thumbnail_url(name):
+            if request:
+                return request.build_absolute_uri(storage.url(name))
+            return f"http://127.0.0.1:8000{storage.url(name)}"
+
+    return [
+        {
+            'id': row['id'],
+            'created_at': to_datetime(row['created_at']),
+            'title': row['title'],
+            'description': row['description'],
+            'thumbnail_url': thumbnail_url(row['thumbnail_image']) if row['thumbnail_image'] else row['thumbnail_url'] or '',
+            'thumbnail_srcset': build_srcset(row['thumbnail_variants'], thumbnail_url),
+            'category': row['category'],
+            'duration': row['duration'],
+        }
+        for row in rows
+    ]
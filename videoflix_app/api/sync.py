@@ -0,0 +1,70 @@
+"""
+Incremental catalog sync.
+A client stores the cursor of its last sync and sends it back as ?since=;
+the response holds only the playable videos created or updated after it and
+the ids of videos deleted or no longer playable since then, read through the
+updated_at and deleted_at indexes.
+"""
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.utils import timezone as django_timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from videoflix_app.models import Video, VideoTombstone
+from .serializers import VIDEO_LIST_FIELDS, serialize_video_list
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = {'error': 'Sync cursor expired, fetch the full catalog.'}
+    default_code = 'cursor_expired'
+
+
+def encode_cursor(moment):
+    """Encode a datetime as base36 microseconds since the epoch"""
+    value = (moment - EPOCH) // timedelta(microseconds=1)
+    digits = ''
+    while True:
+        value, digit = divmod(value, 36)
+        digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+        if not value:
+            return digits
+
+
+def decode_cursor(cursor):
+    try:
+        return EPOCH + timedelta(microseconds=int(cursor, 36))
+    except (ValueError, OverflowError):
+        raise ValidationError({'error': 'Invalid sync cursor.'})
+
+
+def delta_sync(request):
+    """
+    Return the changes since ?since= (everything when it is empty) and the next cursor.
+    The next cursor lags behind the current time by DELTA_SYNC_SAFETY_WINDOW, so
+    rows saved by transactions that commit late are sent again rather than
+    missed; clients apply the response as idempotent upserts and deletes.
+    """
+    now = django_timezone.now()
+    videos = Video.objects.playable().order_by('updated_at', 'id')
+
+    since = request.query_params.get('since')
+    if since:
+        since = decode_cursor(since)
+        if since < now - timedelta(days=settings.DELTA_SYNC_TOMBSTONE_RETENTION_DAYS):
+            raise CursorExpired()
+        videos = videos.filter(updated_at__gt=since)
+        # Videos that stopped being playable (e.g. re-processing) are removed like deleted ones.
+        unplayable = Video.objects.pending().filter(updated_at__gt=since).values_list('id', flat=True)
+        tombstones = VideoTombstone.objects.filter(deleted_at__gt=since).values_list('video_id', flat=True)
+        deleted = list(dict.fromkeys([*tombstones.order_by('deleted_at', 'id'), *unplayable.order_by('id')]))
+    else:
+        deleted = []
+
+    return {
+        'videos': serialize_video_list(videos.values(*VIDEO_LIST_FIELDS), request),
+        'deleted': deleted,
+        'cursor': encode_cursor(now - timedelta(seconds=settings.DELTA_SYNC_SAFETY_WINDOW)),
+    }
@@ -1,8 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from . import async_views
 
 urlpatterns = [
     path('video/', views.VideoView.as_view(), name='video'),
-    path('video/<int:movie_id>/<str:resolution>/index.m3u8', views.HLSManifestView.as_view(), name='hls-manifest'),
-    path('video/<int:movie_id>/<str:resolution>/<str:segment>/', views.HLSSegmentView.as_view(), name='hls-segment'),
-]
\ No newline at end of file
+    path('video/search/', views.VideoSearchView.as_view(), name='video-search'),
+    path('video/rows/', views.VideoRowsView.as_view(), name='video-rows'),
+    path('video/pending/', views.PendingVideosView.as_view(), name='video-pending'),
+    path('video/cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('video/<int:movie_id>/status/', views.VideoStatusView.as_view(), name='video-status'),
+    path('video/<int:movie_id>/master.m3u8', views.HLSMasterPlaylistView.as_view(), name='hls-master'),
+]
+
+if settings.HLS_ASYNC_VIEWS:
+    urlpatterns += [
+        path('video/<int:movie_id>/status/stream/', async_views.video_status_stream, name='video-status-stream'),
+        path('video/<int:movie_id>/<str:resolution>/index.m3u8', async_views.hls_manifest, name='hls-manifest'),
+        path('video/<int:movie_id>/<str:resolution>/<str:segment>/', async_views.hls_segment, name='hls-segment'),
+        path('video/<int:movie_id>/<str:resolution>/signed/<str:token>/<str:segment>', async_views.hls_signed_segment, name='hls-signed-segment'),
+        path('video/<int:movie_id>/trickplay/<str:filename>', async_views.trickplay, name='trickplay'),
+    ]
+else:
+    urlpatterns += [
+        path('video/<int:movie_id>/<str:resolution>/index.m3u8', views.HLSManifestView.as_view(), name='hls-manifest'),
+        path('video/<int:movie_id>/<str:resolution>/<str:segment>/', views.HLSSegmentView.as_view(), name='hls-segment'),
+        path('video/<int:movie_id>/<str:resolution>/signed/<str:token>/<str:segment>', views.SignedHLSSegmentView.as_view(), name='hls-signed-segment'),
+        path('video/<int:movie_id>/trickplay/<str:filename>', views.TrickplayView.as_view(), name='trickplay'),
+    ]
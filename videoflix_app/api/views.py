@@ -1,26 +1,216 @@
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse, Http404
 from django.conf import settings
-from .serializers import VideoSerializer
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.fields import DateTimeField
+from .pagination import VideoCursorPagination
+from .serializers import VIDEO_LIST_FIELDS, serialize_video_list
+from .sync import delta_sync
 from videoflix_app.models import Video
+from videoflix_app.search import search_videos
+from videoflix_app.delivery import serve_bytes, serve_file
+from videoflix_app.catalog import CatalogEntry, catalog_key, get_or_build
+from videoflix_app.cache import load_manifest, manifest_cache, video_locations
+from videoflix_app.segment_cache import segment_cache
+from videoflix_app.playlists import MASTER_PLAYLIST
+from videoflix_app.signing import signed_manifest, verify_segment_token
+from videoflix_app.trickplay import CONTENT_TYPES as TRICKPLAY_CONTENT_TYPES, TRICKPLAY_DIR
+from videoflix_app.progress import get_progress, video_status
+from videoflix_app.tasks import RENDITIONS, generate_master_playlist
+import django_rq
 import os
 
-class VideoView(APIView):
+# Seconds before a master playlist generation that did not succeed is queued again
+MASTER_PLAYLIST_QUEUE_TTL = 60
+
+RENDITION_NAMES = [res['name'] for res in RENDITIONS]
+
+
+class CachedCatalogView(APIView):
+    """
+    Base view for catalog endpoints.
+    The rendered response is cached per query string, host and format under the
+    catalog version and carries an ETag, so unchanged catalogs are answered with 304.
+    Subclasses implement get_catalog_data().
+    """
+    permission_classes = [IsAuthenticated]
+    catalog_name = None
+
+    def get(self, request):
+        try:
+            if request.accepted_renderer.format == 'api':
+                return Response(self.get_catalog_data(request), status=status.HTTP_200_OK)
+
+            key = catalog_key(self.catalog_name, request, request.accepted_media_type)
+            entry = get_or_build(key, lambda: self.render_catalog(request))
+            return serve_bytes(
+                request,
+                entry.content,
+                entry.content_type,
+                entry.etag,
+                None,
+                settings.CATALOG_CACHE_CONTROL
+            )
+        except APIException as e:
+            return Response(e.detail, status=e.status_code)
+        except Exception as e:
+            return Response(
+                {'error': 'Internal server error'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def get_catalog_data(self, request):
+        raise NotImplementedError
+
+    def render_catalog(self, request):
+        renderer = request.accepted_renderer
+        content = renderer.render(
+            self.get_catalog_data(request),
+            request.accepted_media_type,
+            {'request': request, 'view': self}
+        )
+        content_type = request.accepted_media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        return CatalogEntry(content, content_type)
+
+
+class VideoView(CachedCatalogView):
     """
     Handles video listing endpoint.
-    Returns all available videos with metadata.
+    Returns all playable videos with metadata.
+    With ?page_size= or ?cursor= the list is paginated by keyset on (created_at, id).
+    With ?since= only the changes since a previous sync are returned.
     Requires JWT authentication.
     """
-    permission_classes = [IsAuthenticated]
+    catalog_name = 'videos'
+    pagination_class = VideoCursorPagination
+
+    def get_catalog_data(self, request):
+        if 'since' in request.query_params:
+            return delta_sync(request)
+
+        videos = Video.objects.playable().order_by('-created_at', '-id').values(*VIDEO_LIST_FIELDS)
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(videos, request, view=self)
+            return paginator.get_paginated_response(serialize_video_list(page, request)).data
+
+        return serialize_video_list(videos, request)
+
+
+class VideoRowsView(CachedCatalogView):
+    """
+    Handles the home screen rows endpoint.
+    Returns the newest ?per_category= videos of every category, grouped by
+    category, from a single window-function query.
+    Requires JWT authentication.
+    """
+    catalog_name = 'rows'
+
+    def get_per_category(self, request):
+        try:
+            per_category = int(request.query_params.get('per_category', settings.CATALOG_ROWS_PER_CATEGORY))
+        except ValueError:
+            raise ValidationError({'error': 'Invalid per_category.'})
+        return max(1, min(per_category, settings.CATALOG_ROWS_MAX_PER_CATEGORY))
+
+    def get_catalog_data(self, request):
+        per_category = self.get_per_category(request)
+        videos = Video.objects.playable().annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('category'),
+                order_by=[F('created_at').desc(), F('id').desc()]
+            )
+        ).filter(row_number__lte=per_category).order_by('category', '-created_at', '-id')
+
+        values = list(videos.values(*VIDEO_LIST_FIELDS))
+        rows = {}
+        for value, video in zip(values, serialize_video_list(values, request)):
+            rows.setdefault(value['category'], (value['created_at'], []))[1].append(video)
+
+        # Categories with the most recent upload come first.
+        categories = sorted(rows.items(), key=lambda row: row[1][0], reverse=True)
+        return [{'category': category, 'videos': videos} for category, (_, videos) in categories]
+
+
+class VideoSearchView(CachedCatalogView):
+    """
+    Handles video search endpoint.
+    Full-text search over titles and descriptions, ranked with title matches
+    first; titles that only match by trigram similarity (typos, prefixes) fill
+    the remaining results. Both lookups are served by GIN indexes.
+    Requires JWT authentication.
+    """
+    catalog_name = 'search'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.SEARCH_RESULTS_LIMIT))
+        except ValueError:
+            raise ValidationError({'error': 'Invalid limit.'})
+        return max(1, min(limit, settings.SEARCH_RESULTS_MAX_LIMIT))
+
+    def get_catalog_data(self, request):
+        term = request.query_params.get('q', '').strip()
+        if not term:
+            raise ValidationError({'error': 'Search query is required.'})
+
+        videos = search_videos(Video.objects.playable(), term, self.get_limit(request), VIDEO_LIST_FIELDS)
+        return serialize_video_list(videos, request)
+
+
+class PendingVideosView(APIView):
+    """
+    Handles the processing backlog endpoint for operators.
+    Returns videos that are not playable yet, oldest first, read through the
+    partial index on pending videos, with the live progress of their renditions.
+    Requires admin privileges.
+    """
+    permission_classes = [IsAdminUser]
 
     def get(self, request):
         try:
-            videos = Video.objects.all().order_by('-created_at')
-            serializer = VideoSerializer(videos, many=True, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            to_datetime = DateTimeField().to_representation
+            videos = Video.objects.pending().order_by('created_at', 'id').values(
+                'id', 'title', 'created_at', 'is_processing', 'processing_complete'
+            )
+            backlog = [dict(video, created_at=to_datetime(video['created_at'])) for video in videos]
+            progress = get_progress([video['id'] for video in backlog], RENDITION_NAMES)
+            for video in backlog:
+                video['renditions'] = progress[video['id']]
+            return Response({'count': len(backlog), 'videos': backlog}, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response(
+                {'error': 'Internal server error'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class VideoStatusView(APIView):
+    """
+    Handles the processing status endpoint.
+    Returns the processing flags and per-rendition progress (state, percent,
+    speed, fps, eta) of a video.
+    Requires JWT authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, movie_id):
+        try:
+            video = video_status(movie_id, RENDITION_NAMES)
+            if video is None:
+                return Response(
+                    {'error': 'Video not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(video, status=status.HTTP_200_OK)
         except Exception as e:
             return Response(
                 {'error': 'Internal server error'},
@@ -32,42 +222,26 @@ class HLSManifestView(APIView):
     """
     Handles HLS manifest delivery for video streaming.
     Returns M3U8 playlist files for specified video and resolution.
+    Manifests are served from the in-process manifest cache when possible.
+    With HLS_SIGNED_URLS, segment URIs are rewritten to short-lived signed URLs.
+    Supports conditional GET and byte ranges.
     Requires JWT authentication.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, movie_id, resolution):
         try:
-            video = Video.objects.get(id=movie_id)
-            
-            if video.hls_path:
-                manifest_path = os.path.join(
-                    settings.MEDIA_ROOT, 
-                    video.hls_path, 
-                    resolution, 
-                    'index.m3u8'
-                )
-            else:
-                manifest_path = os.path.join(
-                    settings.MEDIA_ROOT, 
-                    'videos', 
-                    f'video_{movie_id}', 
-                    resolution, 
-                    'index.m3u8'
-                )
+            entry = load_manifest(movie_id, resolution)
+            segment_cache.prefetch_playlist(movie_id, entry.path, entry.content)
+            content, etag, last_modified = signed_manifest(entry, request.user.id, movie_id)
             
-            if not os.path.exists(manifest_path):
-                return Response(
-                    {'error': 'Video manifest not found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            with open(manifest_path, 'r', encoding='utf-8') as f:
-                manifest_content = f.read()
-            
-            return HttpResponse(
-                manifest_content,
-                content_type='application/vnd.apple.mpegurl'
+            return serve_bytes(
+                request,
+                content,
+                'application/vnd.apple.mpegurl',
+                etag,
+                last_modified,
+                settings.HLS_MANIFEST_CACHE_CONTROL
             )
             
         except Video.DoesNotExist:
@@ -75,6 +249,68 @@ class HLSManifestView(APIView):
                 {'error': 'Video not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except FileNotFoundError:
+            return Response(
+                {'error': 'Video manifest not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return Response(
+                {'error': 'Internal server error'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class HLSMasterPlaylistView(APIView):
+    """
+    Handles the adaptive-bitrate master playlist of a video.
+    Lists every available resolution with BANDWIDTH, RESOLUTION and CODECS
+    taken from the transcoded files. The playlist is generated once, stored
+    next to the renditions and served through the manifest cache. For older
+    videos without one, the generation is queued and 404 returned meanwhile.
+    Requires JWT authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, movie_id):
+        try:
+            entry = manifest_cache.get((movie_id, MASTER_PLAYLIST))
+            
+            if entry is None:
+                hls_dir = video_locations.get(movie_id)
+                if hls_dir is None:
+                    return Response(
+                        {'error': 'Video not found'},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+                
+                master_path = os.path.join(settings.MEDIA_ROOT, hls_dir, MASTER_PLAYLIST)
+                
+                if not os.path.exists(master_path):
+                    # Converted before master playlists existed: probing the
+                    # renditions is left to a worker, the client retries.
+                    if cache.add(f'master-playlist:queued:{movie_id}', 1, MASTER_PLAYLIST_QUEUE_TTL):
+                        django_rq.get_queue('default').enqueue(generate_master_playlist, movie_id)
+                    return Response(
+                        {'error': 'Video manifest not found'},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+                
+                with open(master_path, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    manifest_content = f.read()
+                
+                entry = manifest_cache.put((movie_id, MASTER_PLAYLIST), master_path, manifest_content, stat)
+            
+            return serve_bytes(
+                request,
+                entry.content,
+                'application/vnd.apple.mpegurl',
+                entry.etag,
+                entry.last_modified,
+                settings.HLS_MANIFEST_CACHE_CONTROL
+            )
+            
         except Exception as e:
             return Response(
                 {'error': 'Internal server error'},
@@ -86,47 +322,95 @@ class HLSSegmentView(APIView):
     """
     Handles HLS segment delivery for video streaming.
     Returns TS segment files for specified video, resolution and segment.
+    The video directory comes from the video location cache instead of a query per segment.
+    Hot segments are served from the shared segment cache when it is enabled.
+    Files are handed to the configured delivery backend instead of being read into memory.
+    Supports conditional GET and byte ranges.
     Requires JWT authentication.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, movie_id, resolution, segment):
         try:
-            video = Video.objects.get(id=movie_id)
-            
-            if video.hls_path:
-                segment_path = os.path.join(
-                    settings.MEDIA_ROOT, 
-                    video.hls_path, 
-                    resolution, 
-                    segment
-                )
-            else:
-                segment_path = os.path.join(
-                    settings.MEDIA_ROOT, 
-                    'videos', 
-                    f'video_{movie_id}', 
-                    resolution, 
-                    segment
+            hls_dir = video_locations.get(movie_id)
+            if hls_dir is None:
+                return Response(
+                    {'error': 'Video not found'},
+                    status=status.HTTP_404_NOT_FOUND
                 )
             
+            segment_path = os.path.join(settings.MEDIA_ROOT, hls_dir, resolution, segment)
+            
             if not os.path.exists(segment_path):
                 return Response(
                     {'error': 'Video segment not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            with open(segment_path, 'rb') as f:
-                segment_content = f.read()
+            segment_path = segment_cache.lookup(movie_id, segment_path)
+            return serve_file(request, segment_path, 'video/MP2T', settings.HLS_SEGMENT_CACHE_CONTROL)
             
-            return HttpResponse(
-                segment_content,
-                content_type='video/MP2T'
+        except FileNotFoundError:
+            return Response(
+                {'error': 'Video segment not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return Response(
+                {'error': 'Internal server error'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class SignedHLSSegmentView(HLSSegmentView):
+    """
+    Handles HLS segment delivery for signed segment URLs from the manifest.
+    Only the URL signature is verified, so no user or session lookup happens.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, movie_id, resolution, token, segment):
+        if verify_segment_token(token, movie_id) is None:
+            return Response(
+                {'error': 'Invalid or expired segment signature'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return super().get(request, movie_id, resolution, segment)
+
+
+class TrickplayView(APIView):
+    """
+    Handles trick-play delivery for scrubbing previews.
+    Returns the WebVTT thumbnail track (thumbnails.vtt) or one of the sprite
+    sheets it references.
+    Supports conditional GET.
+    Requires JWT authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, movie_id, filename):
+        try:
+            content_type = TRICKPLAY_CONTENT_TYPES.get(os.path.splitext(filename)[1])
+            hls_dir = video_locations.get(movie_id)
+            if content_type is None or hls_dir is None:
+                return Response(
+                    {'error': 'Trick-play file not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
             
-        except Video.DoesNotExist:
+            path = os.path.join(settings.MEDIA_ROOT, hls_dir, TRICKPLAY_DIR, filename)
+            if not os.path.isfile(path):
+                return Response(
+                    {'error': 'Trick-play file not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            return serve_file(request, path, content_type, settings.TRICKPLAY_CACHE_CONTROL)
+            
+        except FileNotFoundError:
             return Response(
-                {'error': 'Video not found'},
+                {'error': 'Trick-play file not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
@@ -134,3 +418,19 @@ class HLSSegmentView(APIView):
                 {'error': 'Internal server error'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class CacheStatsView(APIView):
+    """
+    Handles cache statistics endpoint.
+    Returns the counters of the caches in the worker process that answers,
+    plus the node-wide segment cache usage and per-video hit rates.
+    Requires admin authentication.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'manifest_cache': manifest_cache.stats(),
+            'segment_cache': segment_cache.stats(),
+        }, status=status.HTTP_200_OK)
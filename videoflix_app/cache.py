@@ -0,0 +1,226 @@
+"""
+Caches used by the HLS delivery views.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from videoflix_app.delivery import file_etag
+from videoflix_app.models import Video
+
+logger = logging.getLogger(__name__)
+
+
+class ManifestEntry:
+    """Cached manifest bytes with precomputed validators"""
+    __slots__ = ('path', 'content', 'etag', 'last_modified', 'mtime_ns', 'size', 'checked_at')
+
+    def __init__(self, path, content, stat):
+        self.path = path
+        self.content = content
+        self.etag = file_etag(stat)
+        self.last_modified = int(stat.st_mtime)
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.checked_at = time.monotonic()
+
+
+class ManifestCache:
+    """
+    Bounded per-process LRU cache of manifests keyed by (movie_id, resolution).
+    Entries are re-validated against the file mtime at most every
+    HLS_MANIFEST_CACHE_REVALIDATE seconds, so hits in between do no I/O.
+    Video signals drop entries in the process that saved the video; other
+    processes pick up the change on their next re-validation.
+    """
+
+    def __init__(self, max_entries=None, revalidate_after=None):
+        self._max_entries = max_entries
+        self._revalidate_after = revalidate_after
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_entries(self):
+        if self._max_entries is not None:
+            return self._max_entries
+        return settings.HLS_MANIFEST_CACHE_SIZE
+
+    @property
+    def revalidate_after(self):
+        if self._revalidate_after is not None:
+            return self._revalidate_after
+        return settings.HLS_MANIFEST_CACHE_REVALIDATE
+
+    def get(self, key):
+        """Return the cached entry for key or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        now = time.monotonic()
+        if now - entry.checked_at >= self.revalidate_after:
+            try:
+                stat = os.stat(entry.path)
+            except OSError:
+                stat = None
+            if stat is None or stat.st_mtime_ns != entry.mtime_ns or stat.st_size != entry.size:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                    self.misses += 1
+                return None
+            entry.checked_at = now
+
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, path, content, stat):
+        """Store manifest content read from path and return the new entry"""
+        entry = ManifestEntry(path, content, stat)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate_video(self, movie_id):
+        """Drop every cached manifest of a video"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == movie_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class VideoLocationCache:
+    """
+    Two-level cache for the HLS directory of a video (relative to MEDIA_ROOT).
+    A per-process dict with a short TTL sits in front of the shared Django cache (Redis).
+    Unknown ids are cached as well, with their own TTL, so scans do not reach the database.
+    """
+    MISSING = ''
+
+    def __init__(self):
+        self._local = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(movie_id):
+        return f'video-location:{movie_id}'
+
+    def get(self, movie_id):
+        """Return the HLS directory of a video or None if the video does not exist"""
+        now = time.monotonic()
+        local = self._local.get(movie_id)
+        if local is not None and local[1] > now:
+            return local[0] or None
+
+        location = self._get_shared(movie_id)
+        if location is None:
+            row = Video.objects.filter(id=movie_id).values_list('hls_path').first()
+            if row is None:
+                location = self.MISSING
+            else:
+                location = row[0] or os.path.join('videos', f'video_{movie_id}')
+            self._set_shared(movie_id, location)
+
+        ttl = settings.VIDEO_LOCATION_LOCAL_TTL
+        if location == self.MISSING:
+            ttl = min(ttl, settings.VIDEO_LOCATION_NEGATIVE_TTL)
+        with self._lock:
+            self._local[movie_id] = (location, now + ttl)
+            if len(self._local) > settings.VIDEO_LOCATION_LOCAL_SIZE:
+                self._prune(now)
+        return location or None
+
+    def get_local(self, movie_id):
+        """Return (found, location) from the per-process level only, without any I/O"""
+        local = self._local.get(movie_id)
+        if local is not None and local[1] > time.monotonic():
+            return True, local[0] or None
+        return False, None
+
+    def invalidate(self, movie_id):
+        """Forget the location of a video in this process and in the shared cache"""
+        with self._lock:
+            self._local.pop(movie_id, None)
+        try:
+            cache.delete(self.cache_key(movie_id))
+        except Exception as e:
+            logger.error(f"Error invalidating location of video {movie_id}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _get_shared(self, movie_id):
+        try:
+            return cache.get(self.cache_key(movie_id))
+        except Exception as e:
+            logger.error(f"Error reading location of video {movie_id} from cache: {e}")
+            return None
+
+    def _set_shared(self, movie_id, location):
+        if location == self.MISSING:
+            timeout = settings.VIDEO_LOCATION_NEGATIVE_TTL
+        else:
+            timeout = settings.VIDEO_LOCATION_SHARED_TTL
+        try:
+            cache.set(self.cache_key(movie_id), location, timeout)
+        except Exception as e:
+            logger.error(f"Error writing location of video {movie_id} to cache: {e}")
+
+    def _prune(self, now):
+        for key in [key for key, (_, expires) in self._local.items() if expires <= now]:
+            del self._local[key]
+        while len(self._local) > settings.VIDEO_LOCATION_LOCAL_SIZE:
+            del self._local[next(iter(self._local))]
+
+
+manifest_cache = ManifestCache()
+video_locations = VideoLocationCache()
+
+
+def load_manifest(movie_id, resolution):
+    """
+    Return the cached manifest of a video resolution, reading the file on a miss.
+    Raises Video.DoesNotExist or FileNotFoundError when there is nothing to serve.
+    """
+    entry = manifest_cache.get((movie_id, resolution))
+    if entry is None:
+        hls_dir = video_locations.get(movie_id)
+        if hls_dir is None:
+            raise Video.DoesNotExist
+        
+        manifest_path = os.path.join(settings.MEDIA_ROOT, hls_dir, resolution, 'index.m3u8')
+        with open(manifest_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            manifest_content = f.read()
+        
+        entry = manifest_cache.put((movie_id, resolution), manifest_path, manifest_content, stat)
+    return entry
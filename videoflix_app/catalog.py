@@ -0,0 +1,102 @@
+"""
+Shared cache of the rendered video catalog.
+Every cache key contains the catalog version, which the Video signals and the
+processing task bump on every change; stale entries are never read again and
+expire through their TTL.
+"""
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'catalog:version'
+
+
+class CatalogEntry:
+    """Rendered catalog bytes with their ETag"""
+    __slots__ = ('content', 'content_type', 'etag')
+
+    def __init__(self, content, content_type):
+        self.content = content
+        self.content_type = content_type
+        self.etag = f'"{hashlib.blake2b(content, digest_size=12).hexdigest()}"'
+
+
+def catalog_version():
+    """Return the current catalog version, starting at 1"""
+    try:
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, 1, None)
+            version = cache.get(VERSION_KEY, 1)
+        return version
+    except Exception as e:
+        logger.error(f"Error reading catalog version: {e}")
+        return 0
+
+
+def _bump():
+    try:
+        cache.add(VERSION_KEY, 1, None)
+        cache.incr(VERSION_KEY)
+    except Exception as e:
+        logger.error(f"Error bumping catalog version: {e}")
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog page and filter at once.
+    The bump waits for the current transaction to commit, otherwise a request in
+    between could cache the old rows under the new version.
+    """
+    transaction.on_commit(_bump)
+
+
+def catalog_key(name, request, media_type):
+    """
+    Cache key of one rendered variant of a catalog endpoint.
+    Host and scheme are part of it because thumbnail URLs are absolute.
+    """
+    params = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.items()))
+    variant = f'{request.scheme}://{request.get_host()}|{params}|{media_type}'
+    digest = hashlib.blake2b(variant.encode('utf-8'), digest_size=12).hexdigest()
+    return f'catalog:{catalog_version()}:{name}:{digest}'
+
+
+def get_or_build(key, build):
+    """
+    Return the cached entry for key or build it with build().
+    Only one process rebuilds a missing entry; the others wait for it for up to
+    CATALOG_CACHE_LOCK_TIMEOUT seconds and then build it themselves uncached.
+    """
+    try:
+        entry = cache.get(key)
+    except Exception as e:
+        logger.error(f"Error reading catalog cache: {e}")
+        return build()
+    if entry is not None:
+        return entry
+
+    lock_key = f'{key}:lock'
+    timeout = settings.CATALOG_CACHE_LOCK_TIMEOUT
+    if cache.add(lock_key, 1, timeout):
+        try:
+            entry = build()
+            cache.set(key, entry, settings.CATALOG_CACHE_TTL)
+            return entry
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(lock_key) is None:
+            break
+    return build()
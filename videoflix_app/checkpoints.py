@@ -0,0 +1,81 @@
+"""
+Resumable transcoding.
+Renditions are encoded into a staging directory and renamed into place only
+once their playlist is complete, then recorded as a RenditionCheckpoint. A
+retry after a failure or a worker crash skips renditions whose checkpoint
+matches the current source and settings, and a half-written output is never
+mistaken for a finished rendition.
+"""
+import hashlib
+import os
+import shutil
+import time
+from videoflix_app.ffmpeg import playlist_complete
+from videoflix_app.models import RenditionCheckpoint
+
+
+def fingerprint(video, rendition):
+    """Hash of the source file and the encoding settings of a rendition"""
+    stat = os.stat(video.video_file.path)
+    key = repr((
+        video.video_file.name, stat.st_size, stat.st_mtime_ns,
+        rendition['scale'], rendition['bitrate'], video.has_audio is not False,
+    ))
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def completed_renditions(video, renditions, output_dir):
+    """Names of the renditions that are checkpointed for the current source and still on disk"""
+    checkpoints = dict(
+        RenditionCheckpoint.objects.filter(video=video, name__in=[res['name'] for res in renditions])
+        .values_list('name', 'fingerprint')
+    )
+    return {
+        res['name'] for res in renditions
+        if checkpoints.get(res['name']) == fingerprint(video, res)
+        and playlist_complete(os.path.join(output_dir, res['name'], 'index.m3u8'))
+    }
+
+
+def staging_dir(output_dir, names, job_id):
+    """
+    Staging directory of one transcode job. The job id keeps concurrent jobs
+    for the same renditions (a duplicate enqueue, a manual re-run) out of each
+    other's output; retries of a job reuse its id and its directory.
+    """
+    return os.path.join(output_dir, f".staging-{'-'.join(names)}-{job_id}")
+
+
+def sweep_staging(output_dir, max_age):
+    """
+    Remove staging directories older than max_age seconds, the leftovers of
+    runs that were killed. No job runs longer than its timeout, so an older
+    directory cannot belong to a live one.
+    """
+    try:
+        entries = list(os.scandir(output_dir))
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - max_age
+    for entry in entries:
+        try:
+            if entry.name.startswith('.staging-') and entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def publish_rendition(staging, output_dir, name):
+    """Move a finished rendition from staging into place, replacing an older one"""
+    target = os.path.join(output_dir, name)
+    old = os.path.join(staging, f'.old-{name}')
+    if os.path.isdir(target):
+        os.replace(target, old)
+    os.replace(os.path.join(staging, name), target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def record_checkpoint(video, rendition):
+    RenditionCheckpoint.objects.update_or_create(
+        video=video, name=rendition['name'], defaults={'fingerprint': fingerprint(video, rendition)}
+    )
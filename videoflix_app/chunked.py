@@ -0,0 +1,197 @@
+"""
+Chunked transcoding for long sources.
+The source video is cut at keyframes into pieces of about
+TRANSCODE_CHUNK_SECONDS (stream copy, no re-encode). A pool of
+TRANSCODE_CHUNK_WORKERS ffmpeg processes encodes the pieces concurrently, each
+piece decoded once for all renditions, while another one encodes the audio
+once. The pieces of every rendition are then joined by the concat demuxer and
+muxed into HLS in a single pass. Every playlist is continuous: one timeline,
+consecutive segment numbers and no discontinuities.
+"""
+import collections
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from videoflix_app.ffmpeg import hls_output_args, scale_graph
+
+CHUNK_DIR = '.chunks'
+AUDIO_FILE = 'audio.mka'
+
+
+def use_chunked(duration):
+    """Whether a source of duration seconds is transcoded in chunks"""
+    return bool(
+        settings.TRANSCODE_CHUNKED_MIN_DURATION
+        and duration
+        and duration >= settings.TRANSCODE_CHUNKED_MIN_DURATION
+        and settings.TRANSCODE_CHUNK_WORKERS > 1
+    )
+
+
+class ProcessGroup:
+    """The ffmpeg processes of one transcode, so they can all be killed together"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processes = set()
+        self.killed = False
+
+    def add(self, process):
+        with self.lock:
+            self.processes.add(process)
+            if self.killed:
+                process.kill()
+
+    def discard(self, process):
+        with self.lock:
+            self.processes.discard(process)
+
+    def kill(self):
+        with self.lock:
+            self.killed = True
+            for process in self.processes:
+                process.kill()
+
+
+def run(cmd, group=None):
+    """
+    Run an ffmpeg command and raise RuntimeError with the tail of stderr if it
+    fails. The process is killed when the caller is interrupted (e.g. by the
+    RQ job timeout) or when its group is killed.
+    """
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace'
+    )
+    if group is not None:
+        group.add(process)
+    try:
+        stderr_tail = collections.deque(process.stderr, maxlen=settings.TRANSCODE_STDERR_LINES)
+        returncode = process.wait()
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        process.stderr.close()
+        if group is not None:
+            group.discard(process)
+    if returncode != 0:
+        raise RuntimeError(''.join(stderr_tail))
+
+
+def split_source(input_path, chunk_dir):
+    """Cut the video stream at keyframes into source_<n>.mkv pieces and return their paths in order"""
+    run([
+        'ffmpeg', '-v', 'error', '-y', '-i', input_path,
+        '-map', '0:v:0', '-c', 'copy',
+        '-f', 'segment', '-segment_time', str(settings.TRANSCODE_CHUNK_SECONDS), '-reset_timestamps', '1',
+        os.path.join(chunk_dir, 'source_%05d.mkv')
+    ])
+    return sorted(os.path.join(chunk_dir, name) for name in os.listdir(chunk_dir) if name.startswith('source_'))
+
+
+def chunk_path(chunk_dir, name, number):
+    return os.path.join(chunk_dir, f'{name}_{number}.mkv')
+
+
+def encode_chunk(piece, renditions, threads, group):
+    """Encode one piece into every rendition in one ffmpeg process"""
+    chunk_dir, number = os.path.dirname(piece), os.path.basename(piece)[len('source_'):-len('.mkv')]
+    cmd = ['ffmpeg', '-v', 'error', '-y', '-i', piece, '-filter_complex', scale_graph(renditions)]
+    for index, res in enumerate(renditions):
+        cmd += [
+            '-map', f'[v{index}out]',
+            '-c:v', 'libx264', '-b:v', f"{res['bitrate']}k", '-threads', str(threads),
+            chunk_path(chunk_dir, res['name'], number)
+        ]
+    run(cmd, group)
+
+
+def encode_audio(input_path, chunk_dir, group):
+    run([
+        'ffmpeg', '-v', 'error', '-y', '-i', input_path,
+        '-map', '0:a:0', '-vn', '-c:a', 'aac',
+        os.path.join(chunk_dir, AUDIO_FILE)
+    ], group)
+
+
+def write_concat_list(chunk_dir, name, numbers):
+    path = os.path.join(chunk_dir, f'{name}.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        for number in numbers:
+            escaped = chunk_path(chunk_dir, name, number).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return path
+
+
+def mux_command(chunk_dir, output_dir, renditions, numbers, audio):
+    """Join the encoded pieces of every rendition and mux them with the audio into HLS"""
+    cmd = ['ffmpeg', '-v', 'error', '-y']
+    for res in renditions:
+        cmd += ['-f', 'concat', '-safe', '0', '-i', write_concat_list(chunk_dir, res['name'], numbers)]
+    if audio:
+        cmd += ['-i', os.path.join(chunk_dir, AUDIO_FILE)]
+
+    stream_map = []
+    for index, res in enumerate(renditions):
+        cmd += ['-map', f'{index}:v:0']
+        if audio:
+            cmd += ['-map', f'{len(renditions)}:a:0']
+        streams = f'v:{index},a:{index}' if audio else f'v:{index}'
+        stream_map.append(f"{streams},name:{res['name']}")
+    cmd += ['-c', 'copy']
+
+    return cmd + hls_output_args(output_dir, stream_map)
+
+
+def transcode_chunked(input_path, output_dir, renditions, duration, audio=True, on_progress=None):
+    """
+    Write the renditions as HLS to <output_dir>/<name>/ through chunked encoding.
+    on_progress is called with {'state', 'percent', 'speed', 'fps', 'eta'}
+    whenever a piece is done. Raises RuntimeError when a step fails.
+    """
+    chunk_dir = os.path.join(output_dir, CHUNK_DIR)
+    os.makedirs(chunk_dir, exist_ok=True)
+    workers = settings.TRANSCODE_CHUNK_WORKERS
+    # Each process gets its share of the cores instead of x264's default of all of them.
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    pieces = split_source(input_path, chunk_dir)
+    numbers = [os.path.basename(piece)[len('source_'):-len('.mkv')] for piece in pieces]
+    start = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    group = ProcessGroup()
+    try:
+        audio_future = pool.submit(encode_audio, input_path, chunk_dir, group) if audio else None
+        futures = [pool.submit(encode_chunk, piece, renditions, threads, group) for piece in pieces]
+        done = 0
+        for future in as_completed(futures):
+            future.result()
+            done += 1
+            if on_progress and duration:
+                encoded = duration * done / len(pieces)
+                speed = encoded / max(time.monotonic() - start, 1e-6)
+                on_progress({
+                    'state': 'running',
+                    'percent': round(encoded / duration * 100, 1),
+                    'speed': round(speed, 3),
+                    'fps': None,
+                    'eta': round((duration - encoded) / speed) if speed else None,
+                })
+        if audio_future:
+            audio_future.result()
+    except BaseException:
+        # A failed piece or the RQ job timeout: drop the pieces not started yet
+        # and kill the running ffmpeg processes instead of waiting for them.
+        pool.shutdown(wait=False, cancel_futures=True)
+        group.kill()
+        raise
+    finally:
+        pool.shutdown(wait=True)
+
+    run(mux_command(chunk_dir, output_dir, renditions, numbers, audio))
+    if on_progress:
+        on_progress({'state': 'done', 'percent': 100.0, 'speed': None, 'fps': None, 'eta': 0})
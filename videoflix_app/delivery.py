@@ -0,0 +1,311 @@
+"""
+Delivery of HLS manifests and segments.
+Handles conditional GET (ETag/Last-Modified), byte ranges and caching headers.
+Segment files are handed to the backend selected with the HLS_DELIVERY_BACKEND setting.
+"""
+import asyncio
+import inspect
+import os
+import secrets
+from stat import S_ISREG
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.module_loading import import_string
+
+MAX_RANGES = 16
+
+
+def file_etag(stat):
+    """Strong ETag derived from file size and modification time"""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range_header(header, size):
+    """
+    Parse a 'bytes=' Range header into a list of inclusive (start, end) tuples.
+    Returns None when the header should be ignored and [] when no range is satisfiable.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+
+    ranges = []
+    specs = header[len('bytes='):].split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+
+    for spec in specs:
+        start, sep, end = spec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if start:
+                start = int(start)
+                end = int(end) if end else size - 1
+                if end < start and start < size:
+                    return None
+            else:
+                suffix_length = int(end)
+                if suffix_length == 0:
+                    continue
+                start = max(size - suffix_length, 0)
+                end = size - 1
+        except ValueError:
+            return None
+
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    return ranges
+
+
+def requested_ranges(request, size, etag, last_modified):
+    """Return the ranges to serve, honouring If-Range, or None for the full body"""
+    header = request.META.get('HTTP_RANGE')
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range:
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    return parse_range_header(header, size)
+
+
+def range_not_satisfiable(size):
+    response = HttpResponse(status=416)
+    response['Content-Range'] = f'bytes */{size}'
+    return response
+
+
+def partial_response(ranges, size, content_type, read):
+    """
+    Build a 206 response for the given ranges.
+    read(start, end) yields the bytes of one inclusive range; it may be an async generator.
+    """
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(read(start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+        return response
+
+    boundary = secrets.token_hex(16)
+    part_headers = [
+        (
+            f'--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('ascii')
+        for start, end in ranges
+    ]
+    closing = f'--{boundary}--\r\n'.encode('ascii')
+
+    if inspect.isasyncgenfunction(read):
+        async def body():
+            for header, (start, end) in zip(part_headers, ranges):
+                yield header
+                async for chunk in read(start, end):
+                    yield chunk
+                yield b'\r\n'
+            yield closing
+    else:
+        def body():
+            for header, (start, end) in zip(part_headers, ranges):
+                yield header
+                yield from read(start, end)
+                yield b'\r\n'
+            yield closing
+
+    response = StreamingHttpResponse(
+        body(), status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+    )
+    response['Content-Length'] = (
+        sum(len(header) + end - start + 1 + 2 for header, (start, end) in zip(part_headers, ranges))
+        + len(closing)
+    )
+    return response
+
+
+def read_file_range(path, chunk_size):
+    """Return a reader for partial_response that streams ranges of a file"""
+    def read(start, end):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    return read
+
+
+def aread_file_range(path, chunk_size):
+    """Async variant of read_file_range; blocking file calls run in a worker thread"""
+    async def read(start, end):
+        f = await asyncio.to_thread(open, path, 'rb')
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+    return read
+
+
+class StreamingDelivery:
+    """
+    Streams the file from disk in fixed-size chunks.
+    Under gunicorn the open file is handed to wsgi.file_wrapper, which uses sendfile.
+    """
+    # Django reads the file itself, so the shared segment cache can serve it.
+    offloads = False
+
+    def serve(self, path, content_type, size, ranges):
+        if ranges is not None:
+            if not ranges:
+                return range_not_satisfiable(size)
+            return partial_response(
+                ranges, size, content_type, read_file_range(path, settings.HLS_STREAM_CHUNK_SIZE)
+            )
+
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response.block_size = settings.HLS_STREAM_CHUNK_SIZE
+        return response
+
+
+class AccelRedirectDelivery:
+    """
+    Lets nginx serve the file through an internal location.
+    Only the X-Accel-Redirect header is sent from Django; nginx applies Range itself.
+    """
+    offloads = True
+
+    def serve(self, path, content_type, size, ranges):
+        relative_path = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.HLS_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative_path
+        return response
+
+
+class XSendfileDelivery:
+    """
+    Lets Apache (mod_xsendfile) or lighttpd serve the file by absolute path.
+    Only the X-Sendfile header is sent from Django; the server applies Range itself.
+    """
+    offloads = True
+
+    def serve(self, path, content_type, size, ranges):
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = os.path.abspath(path)
+        return response
+
+
+DELIVERY_BACKENDS = {
+    'stream': StreamingDelivery,
+    'accel-redirect': AccelRedirectDelivery,
+    'x-sendfile': XSendfileDelivery,
+}
+
+_backend = None
+
+
+def get_delivery_backend():
+    """Return the configured delivery backend (alias or dotted path)"""
+    global _backend
+    name = settings.HLS_DELIVERY_BACKEND
+    if _backend is None or _backend[0] != name:
+        backend_class = DELIVERY_BACKENDS.get(name) or import_string(name)
+        _backend = (name, backend_class())
+    return _backend[1]
+
+
+def set_validators(response, etag, last_modified, cache_control):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    if response.status_code != 304:
+        response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_file(request, path, content_type, cache_control):
+    """
+    Build the response for a file on disk using the configured backend.
+    Answers conditional requests with 304 before the backend is involved.
+    Raises FileNotFoundError when path is missing or not a regular file.
+    """
+    stat = os.stat(path)
+    if not S_ISREG(stat.st_mode):
+        raise FileNotFoundError(path)
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        ranges = requested_ranges(request, stat.st_size, etag, last_modified)
+        response = get_delivery_backend().serve(path, content_type, stat.st_size, ranges)
+
+    return set_validators(response, etag, last_modified, cache_control)
+
+
+async def aserve_file(request, path, content_type, cache_control):
+    """
+    Async variant of serve_file for ASGI.
+    The stream backend reads the file in a worker thread, chunk by chunk, so a slow
+    client only costs an idle coroutine; offload backends behave as in serve_file.
+    """
+    stat = await asyncio.to_thread(os.stat, path)
+    if not S_ISREG(stat.st_mode):
+        raise FileNotFoundError(path)
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        size = stat.st_size
+        ranges = requested_ranges(request, size, etag, last_modified)
+        backend = get_delivery_backend()
+        read = aread_file_range(path, settings.HLS_STREAM_CHUNK_SIZE)
+        if not isinstance(backend, StreamingDelivery):
+            response = backend.serve(path, content_type, size, ranges)
+        elif ranges is None:
+            response = StreamingHttpResponse(read(0, size - 1), content_type=content_type)
+            response['Content-Length'] = size
+        elif not ranges:
+            response = range_not_satisfiable(size)
+        else:
+            response = partial_response(ranges, size, content_type, read)
+
+    return set_validators(response, etag, last_modified, cache_control)
+
+
+def serve_bytes(request, content, content_type, etag, last_modified, cache_control):
+    """Build the response for in-memory content such as a manifest"""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        size = len(content)
+        ranges = requested_ranges(request, size, etag, last_modified)
+        if ranges is None:
+            response = HttpResponse(content, content_type=content_type)
+        elif not ranges:
+            response = range_not_satisfiable(size)
+        else:
+            response = partial_response(
+                ranges, size, content_type, lambda start, end: iter((content[start:end + 1],))
+            )
+
+    return set_validators(response, etag, last_modified, cache_control)
@@ -0,0 +1,118 @@
+"""
+Helpers around the ffmpeg/ffprobe command line tools.
+"""
+import json
+import os
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def probe(path):
+    """Return the ffprobe format and stream information of a media file, or None"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_format', '-show_streams',
+        '-of', 'json',
+        path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        logger.error(f"Could not run ffprobe on {path}: {e}")
+        return None
+
+    if result.returncode != 0:
+        logger.error(f"FFprobe error for {path}: {result.stderr}")
+        return None
+    return json.loads(result.stdout)
+
+
+def parse_rate(rate):
+    """Return an ffprobe rate like '30000/1001' as a float, or None"""
+    num, _, den = (rate or '').partition('/')
+    try:
+        value = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value or None
+
+
+def media_metadata(path):
+    """
+    Probe a source once and return the Video metadata fields (duration, width,
+    height, frame_rate, video_codec, audio_codec, has_audio), or None.
+    """
+    probed = probe(path)
+    if probed is None:
+        return None
+
+    streams = probed.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), {})
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    try:
+        duration = float(probed.get('format', {})['duration'])
+    except (KeyError, ValueError):
+        duration = None
+
+    return {
+        'duration': duration,
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'frame_rate': parse_rate(video.get('avg_frame_rate')) or parse_rate(video.get('r_frame_rate')),
+        'video_codec': video.get('codec_name', ''),
+        'audio_codec': audio.get('codec_name', '') if audio else '',
+        'has_audio': audio is not None,
+    }
+
+
+def scale_graph(renditions, source='0:v'):
+    """Filter graph that splits the decoded source into one scaled output [v<index>out] per rendition"""
+    outputs = ''.join(f'[v{index}]' for index in range(len(renditions)))
+    graph = [f'[{source}]split={len(renditions)}{outputs}']
+    graph += [f"[v{index}]scale={res['scale']}[v{index}out]" for index, res in enumerate(renditions)]
+    return ';'.join(graph)
+
+
+def hls_output_args(output_dir, stream_map):
+    """HLS muxer options writing each variant of stream_map to <output_dir>/<name>/"""
+    return [
+        '-f', 'hls',
+        '-hls_time', '6',
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output_dir, '%v', 'segment_%03d.ts'),
+        '-var_stream_map', ' '.join(stream_map),
+        os.path.join(output_dir, '%v', 'index.m3u8')
+    ]
+
+
+def hls_command(input_path, output_dir, renditions, audio=True):
+    """
+    Build one ffmpeg invocation that writes every rendition as HLS.
+    The source is decoded once, split and scaled per rendition, and the HLS
+    muxer writes each variant to <output_dir>/<name>/ through -var_stream_map.
+    Audio is mapped into every variant, so segments stay muxed like before.
+    """
+    cmd = ['ffmpeg', '-y', '-i', input_path, '-filter_complex', scale_graph(renditions)]
+    stream_map = []
+    for index, res in enumerate(renditions):
+        cmd += ['-map', f'[v{index}out]']
+        if audio:
+            cmd += ['-map', '0:a:0']
+        cmd += [f'-c:v:{index}', 'libx264', f'-b:v:{index}', f"{res['bitrate']}k"]
+        streams = f'v:{index},a:{index}' if audio else f'v:{index}'
+        stream_map.append(f"{streams},name:{res['name']}")
+    if audio:
+        cmd += ['-c:a', 'aac']
+
+    return cmd + hls_output_args(output_dir, stream_map)
+
+
+def playlist_complete(path):
+    """Whether a media playlist exists and was finished by the muxer"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return '#EXT-X-ENDLIST' in f.read()
+    except OSError:
+        return False
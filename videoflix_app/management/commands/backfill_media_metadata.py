@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from videoflix_app.catalog import bump_catalog_version
+from videoflix_app.ffmpeg import media_metadata
+from videoflix_app.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Probe the sources of videos without stored metadata (duration, resolution, codecs) and save it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Probe every video, not only those without a duration')
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(video_file='').exclude(video_file__isnull=True)
+        if not options['all']:
+            videos = videos.filter(duration__isnull=True)
+
+        updated = failed = 0
+        for video_id, video_file in videos.values_list('id', 'video_file').iterator():
+            metadata = media_metadata(Video._meta.get_field('video_file').storage.path(video_file))
+            if metadata is None:
+                failed += 1
+                continue
+            # updated_at moves, so delta sync clients pick up the duration.
+            Video.objects.filter(id=video_id).update(updated_at=timezone.now(), **metadata)
+            updated += 1
+
+        if updated:
+            bump_catalog_version()
+        self.stdout.write(f'{updated} videos updated, {failed} could not be probed')
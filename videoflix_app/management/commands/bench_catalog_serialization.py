@@ -0,0 +1,82 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from videoflix_app.api.serializers import VIDEO_LIST_FIELDS, VideoSerializer, serialize_video_list
+from videoflix_app.models import Video
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare VideoSerializer with the projection-based catalog path on a '
+        'temporary set of videos. The videos are created in a transaction that is '
+        'rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--videos', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--description-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def run(self, options):
+        description = 'x' * options['description_size']
+        Video.objects.bulk_create([
+            Video(
+                title=f'Video {index}',
+                description=description,
+                category=f'Category {index % 10}',
+                video_file=f'videos/originals/video_{index}.mp4',
+                thumbnail_image=f'videos/thumbnails/video_{index}_thumb.jpg' if index % 2 else None,
+                thumbnail_url='' if index % 2 else f'https://cdn.example.com/video_{index}.jpg',
+                thumbnail_variants=[
+                    {'format': image_format, 'width': width, 'height': width * 9 // 16,
+                     'path': f'videos/thumbnails/video_{index}_{width}w.{extension}'}
+                    for width in (320, 640, 1280) for image_format, extension in (('webp', 'webp'), ('jpeg', 'jpg'))
+                ] if index % 2 else [],
+                hls_path=f'videos/hls/video_{index}',
+            )
+            for index in range(options['videos'])
+        ], batch_size=1000)
+
+        request = Request(RequestFactory().get('/api/video/'))
+        renderer = JSONRenderer()
+
+        def serializer_path():
+            videos = Video.objects.all().order_by('-created_at', '-id')
+            return renderer.render(VideoSerializer(videos, many=True, context={'request': request}).data)
+
+        def projection_path():
+            videos = Video.objects.order_by('-created_at', '-id').values(*VIDEO_LIST_FIELDS)
+            return renderer.render(serialize_video_list(videos, request))
+
+        if serializer_path() != projection_path():
+            raise CommandError('The projection path does not render the same bytes as VideoSerializer')
+
+        self.stdout.write(f"{options['videos']} videos, best and median of {options['repeat']} runs (query + serialize + render)")
+        results = {}
+        for name, func in (('VideoSerializer', serializer_path), ('projection', projection_path)):
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+            results[name] = min(timings)
+            self.stdout.write(
+                f'{name:16} best {min(timings) * 1000:8.1f} ms   median {statistics.median(timings) * 1000:8.1f} ms'
+            )
+        self.stdout.write(f"speedup: {results['VideoSerializer'] / results['projection']:.1f}x")
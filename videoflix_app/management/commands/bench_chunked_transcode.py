@@ -0,0 +1,90 @@
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from videoflix_app.chunked import transcode_chunked
+from videoflix_app.ffmpeg import hls_command, playlist_complete
+from videoflix_app.playlists import parse_media_playlist
+from videoflix_app.tasks import RENDITIONS
+
+
+def children_cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the single-pass HLS transcode with chunked parallel transcoding '
+        'on a synthetic source (testsrc2 and a sine tone), and check that the '
+        'chunked playlists are continuous.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=int, default=240)
+        parser.add_argument('--size', default='1280x720')
+        parser.add_argument('--rate', type=int, default=30)
+        parser.add_argument('--chunk-seconds', type=int, default=30)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'source.mp4')
+            result = subprocess.run([
+                'ffmpeg', '-y', '-v', 'error',
+                '-f', 'lavfi', '-i', f"testsrc2=size={options['size']}:rate={options['rate']}:duration={options['duration']}",
+                '-f', 'lavfi', '-i', f"sine=frequency=440:duration={options['duration']}",
+                # A keyframe every 2 seconds, like typical camera and phone uploads.
+                '-c:v', 'libx264', '-preset', 'veryfast', '-g', str(options['rate'] * 2), '-c:a', 'aac', '-shortest',
+                source
+            ], capture_output=True, text=True)
+            if result.returncode != 0:
+                raise CommandError(result.stderr)
+
+            self.stdout.write(
+                f"{options['duration']}s {options['size']}@{options['rate']} source, {len(RENDITIONS)} renditions, "
+                f"{options['chunk_seconds']}s chunks, {options['workers']} workers"
+            )
+            results = {}
+            for name in ('single-pass', 'chunked'):
+                output_dir = os.path.join(tmp, name)
+                for res in RENDITIONS:
+                    os.makedirs(os.path.join(output_dir, res['name']))
+
+                cpu_start, start = children_cpu_time(), time.perf_counter()
+                if name == 'chunked':
+                    with override_settings(
+                        TRANSCODE_CHUNK_SECONDS=options['chunk_seconds'], TRANSCODE_CHUNK_WORKERS=options['workers']
+                    ):
+                        transcode_chunked(source, output_dir, RENDITIONS, options['duration'])
+                else:
+                    result = subprocess.run(hls_command(source, output_dir, RENDITIONS), capture_output=True, text=True)
+                    if result.returncode != 0:
+                        raise CommandError(result.stderr)
+                wall, cpu = time.perf_counter() - start, children_cpu_time() - cpu_start
+                results[name] = wall
+
+                durations = [self.check_playlist(name, os.path.join(output_dir, res['name'])) for res in RENDITIONS]
+                self.stdout.write(
+                    f'{name:12} wall {wall:7.2f} s   cpu {cpu:7.2f} s   '
+                    f'playlist duration {"/".join(f"{duration:.2f}" for duration in durations)} s'
+                )
+
+        self.stdout.write(f"speedup: {results['single-pass'] / results['chunked']:.2f}x")
+
+    def check_playlist(self, name, rendition_dir):
+        """Fail unless the playlist is complete, continuous and numbered without gaps; return its duration"""
+        playlist = os.path.join(rendition_dir, 'index.m3u8')
+        if not playlist_complete(playlist):
+            raise CommandError(f'{name}: {playlist} was not completed')
+        with open(playlist, encoding='utf-8') as f:
+            if '#EXT-X-DISCONTINUITY' in f.read():
+                raise CommandError(f'{name}: {playlist} has discontinuities')
+        segments = parse_media_playlist(playlist)
+        expected = [f'segment_{index:03d}.ts' for index in range(len(segments))]
+        if [uri for _, uri in segments] != expected:
+            raise CommandError(f'{name}: {playlist} segments are not numbered consecutively')
+        return sum(duration for duration, _ in segments)
@@ -0,0 +1,62 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from videoflix_app.api.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from videoflix_app.api.serializers import serialize_video_list
+
+
+class Command(BaseCommand):
+    help = 'Compare encode time and payload size of the API renderers on a large video list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--videos', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        rows = [
+            {
+                'id': index,
+                'created_at': now - timedelta(minutes=index, microseconds=index),
+                'title': f'Video {index} – Überblick',
+                'description': 'A description of the video. ' * 10,
+                'category': f'Category {index % 10}',
+                'thumbnail_image': f'videos/thumbnails/video_{index}_thumb.jpg',
+                'thumbnail_url': '',
+                'thumbnail_variants': [],
+                'duration': 90.0 + index,
+            }
+            for index in range(options['videos'])
+        ]
+        data = serialize_video_list(rows)
+        # Raw values as well, to check that the encoders format them like DRF.
+        data[0]['raw'] = {'created_at': now, 'price': Decimal('9.99'), 'duration': timedelta(seconds=90)}
+
+        renderers = [('JSONRenderer', JSONRenderer()), ('FastJSONRenderer', FastJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('MessagePackRenderer', MessagePackRenderer()))
+        if orjson is None:
+            self.stdout.write('orjson is not installed, FastJSONRenderer uses the stdlib encoder')
+
+        expected = json.loads(JSONRenderer().render(data, 'application/json'))
+        if json.loads(FastJSONRenderer().render(data, 'application/json')) != expected:
+            raise CommandError('FastJSONRenderer does not render the same JSON as JSONRenderer')
+
+        self.stdout.write(f"{options['videos']} videos, best and median of {options['repeat']} runs")
+        baseline = None
+        for name, renderer in renderers:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                content = renderer.render(data, renderer.media_type)
+                timings.append(time.perf_counter() - start)
+            baseline = baseline or min(timings)
+            self.stdout.write(
+                f'{name:20} best {min(timings) * 1000:7.1f} ms   median {statistics.median(timings) * 1000:7.1f} ms   '
+                f'{len(content) / 1024:8.1f} KiB   {baseline / min(timings):4.1f}x'
+            )
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from videoflix_app.delivery import serve_file
+
+
+def buffered_response(path, content_type):
+    """Previous behaviour: read the whole segment into memory"""
+    with open(path, 'rb') as f:
+        return HttpResponse(f.read(), content_type=content_type)
+
+
+def consume(response):
+    """Drain a response like a WSGI server would and return the number of body bytes"""
+    total = 0
+    if response.streaming:
+        for chunk in response:
+            total += len(chunk)
+    else:
+        total = len(response.content)
+    response.close()
+    return total
+
+
+def run_mode(mode, path, requests, concurrency, queue):
+    """Run one mode in a fresh process so ru_maxrss only reflects that mode"""
+    if mode != 'buffered':
+        settings.HLS_DELIVERY_BACKEND = mode
+    request = RequestFactory().get('/')
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def handle(_):
+        if mode == 'buffered':
+            return consume(buffered_response(path, 'video/MP2T'))
+        return consume(serve_file(request, path, 'video/MP2T', settings.HLS_SEGMENT_CACHE_CONTROL))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        body_bytes = sum(executor.map(handle, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((mode, elapsed, body_bytes, baseline_rss, peak_rss))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare peak RSS and throughput of the HLS segment delivery modes. '
+        'Offload modes report 0 MB/s because the proxy sends the body.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segment-size', type=int, default=4 * 1024 * 1024, help='Segment size in bytes')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--modes', nargs='+',
+            default=['buffered', 'stream', 'accel-redirect', 'x-sendfile'],
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.NamedTemporaryFile(suffix='.ts', delete=False) as f:
+            f.write(os.urandom(options['segment_size']))
+            path = f.name
+
+        try:
+            context = multiprocessing.get_context('fork')
+            queue = context.Queue()
+
+            self.stdout.write(
+                f"{'mode':<16}{'req/s':>10}{'MB/s':>10}{'peak RSS':>12}{'RSS growth':>12}"
+            )
+            for mode in options['modes']:
+                process = context.Process(
+                    target=run_mode,
+                    args=(mode, path, options['requests'], options['concurrency'], queue),
+                )
+                process.start()
+                mode, elapsed, body_bytes, baseline_rss, peak_rss = queue.get()
+                process.join()
+
+                self.stdout.write(
+                    f"{mode:<16}"
+                    f"{options['requests'] / elapsed:>10.1f}"
+                    f"{body_bytes / elapsed / 1024 / 1024:>10.1f}"
+                    f"{peak_rss / 1024:>10.1f}MB"
+                    f"{(peak_rss - baseline_rss) / 1024:>10.1f}MB"
+                )
+        finally:
+            os.remove(path)
@@ -0,0 +1,95 @@
+import asyncio
+import socket
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand
+
+
+async def fetch(host, port, request, read_size, delay, timeout):
+    """
+    Fetch a URL over a socket with a small receive buffer, reading read_size bytes
+    every delay seconds. Returns (time to first byte, total time, bytes) or None on failure.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, max(read_size, 4096))
+    sock.setblocking(False)
+    try:
+        async with asyncio.timeout(timeout):
+            await loop.sock_connect(sock, (host, port))
+            reader, writer = await asyncio.open_connection(sock=sock, limit=read_size)
+            writer.write(request)
+            await writer.drain()
+
+            chunk = await reader.read(read_size)
+            first_byte = time.perf_counter() - start
+            received = len(chunk)
+            while chunk:
+                if delay:
+                    await asyncio.sleep(delay)
+                chunk = await reader.read(read_size)
+                received += len(chunk)
+            writer.close()
+        return first_byte, time.perf_counter() - start, received
+    except (OSError, TimeoutError):
+        sock.close()
+        return None
+
+
+def describe(values):
+    if not values:
+        return '-'
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return f'p50 {statistics.median(values):.2f}s  p95 {p95:.2f}s  max {values[-1]:.2f}s'
+
+
+class Command(BaseCommand):
+    help = (
+        'Open many slow HTTP clients against a running server and measure whether it '
+        'still answers. Run it once against the sync gunicorn server and once against '
+        'uvicorn with HLS_ASYNC_VIEWS=True, both with a single worker process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Segment URL, e.g. a signed segment URL from a manifest')
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--rate', type=int, default=64 * 1024, help='Bytes per second each slow client reads')
+        parser.add_argument('--cookie', default='', help='Cookie header, e.g. access_token=...')
+        parser.add_argument('--timeout', type=float, default=120)
+        parser.add_argument('--probe-delay', type=float, default=2, help='Seconds before the fast probe request')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        url = urlsplit(options['url'])
+        host = url.hostname
+        port = url.port or 80
+        path = url.path + (f'?{url.query}' if url.query else '')
+        headers = [f'GET {path} HTTP/1.1', f'Host: {url.netloc}', 'Connection: close']
+        if options['cookie']:
+            headers.append(f"Cookie: {options['cookie']}")
+        request = ('\r\n'.join(headers) + '\r\n\r\n').encode('ascii')
+
+        read_size = 4096
+        delay = read_size / options['rate']
+        slow = [
+            asyncio.create_task(fetch(host, port, request, read_size, delay, options['timeout']))
+            for _ in range(options['clients'])
+        ]
+
+        await asyncio.sleep(options['probe_delay'])
+        probe = await fetch(host, port, request, 64 * 1024, 0, options['timeout'])
+        results = await asyncio.gather(*slow)
+
+        completed = [result for result in results if result is not None]
+        self.stdout.write(f"slow clients:       {len(completed)}/{options['clients']} completed")
+        self.stdout.write(f'time to first byte: {describe([result[0] for result in completed])}')
+        self.stdout.write(f'total time:         {describe([result[1] for result in completed])}')
+        if probe is None:
+            self.stdout.write(f"probe request:      no response within {options['timeout']}s")
+        else:
+            self.stdout.write(f'probe request:      first byte after {probe[0]:.2f}s, done after {probe[1]:.2f}s')
@@ -0,0 +1,89 @@
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from videoflix_app.ffmpeg import hls_command, playlist_complete
+from videoflix_app.playlists import parse_media_playlist
+from videoflix_app.tasks import RENDITIONS
+
+
+def per_rendition_commands(input_path, output_dir):
+    """The previous approach: one ffmpeg process, and one full decode, per rendition"""
+    return [
+        [
+            'ffmpeg', '-y', '-i', input_path,
+            '-vf', f"scale={res['scale']}",
+            '-c:v', 'libx264',
+            '-b:v', f"{res['bitrate']}k",
+            '-c:a', 'aac',
+            '-hls_time', '6',
+            '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', os.path.join(output_dir, res['name'], 'segment_%03d.ts'),
+            os.path.join(output_dir, res['name'], 'index.m3u8')
+        ]
+        for res in RENDITIONS
+    ]
+
+
+def children_cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-rendition ffmpeg processes with the single-pass HLS '
+        'transcode on a synthetic source (testsrc2 and a sine tone).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=int, default=30)
+        parser.add_argument('--size', default='1920x1080')
+        parser.add_argument('--rate', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'source.mp4')
+            self.run([
+                'ffmpeg', '-y', '-v', 'error',
+                '-f', 'lavfi', '-i', f"testsrc2=size={options['size']}:rate={options['rate']}:duration={options['duration']}",
+                '-f', 'lavfi', '-i', f"sine=frequency=440:duration={options['duration']}",
+                '-c:v', 'libx264', '-preset', 'veryfast', '-c:a', 'aac', '-shortest',
+                source
+            ])
+
+            self.stdout.write(f"{options['duration']}s {options['size']}@{options['rate']} source, {len(RENDITIONS)} renditions")
+            results = {}
+            for name, build in (
+                ('per-rendition', lambda output_dir: per_rendition_commands(source, output_dir)),
+                ('single-pass', lambda output_dir: [hls_command(source, output_dir, RENDITIONS)]),
+            ):
+                output_dir = os.path.join(tmp, name)
+                for res in RENDITIONS:
+                    os.makedirs(os.path.join(output_dir, res['name']))
+
+                cpu_start, start = children_cpu_time(), time.perf_counter()
+                for cmd in build(output_dir):
+                    self.run(cmd)
+                wall, cpu = time.perf_counter() - start, children_cpu_time() - cpu_start
+                results[name] = (wall, cpu)
+
+                segments = []
+                for res in RENDITIONS:
+                    playlist = os.path.join(output_dir, res['name'], 'index.m3u8')
+                    if not playlist_complete(playlist):
+                        raise CommandError(f"{name}: rendition {res['name']} was not written")
+                    segments.append(len(parse_media_playlist(playlist)))
+                self.stdout.write(
+                    f'{name:14} wall {wall:7.2f} s   cpu {cpu:7.2f} s   segments {"/".join(map(str, segments))}'
+                )
+
+        (old_wall, old_cpu), (new_wall, new_cpu) = results['per-rendition'], results['single-pass']
+        self.stdout.write(f'saving: wall {1 - new_wall / old_wall:.0%}, cpu {1 - new_cpu / old_cpu:.0%}')
+
+    def run(self, cmd):
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(result.stderr)
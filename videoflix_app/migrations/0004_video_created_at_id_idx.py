@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0003_video_has_1080p_video_has_480p_video_has_720p_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['-created_at', '-id'], name='video_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0004_video_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='video_category_created_at_idx'),
+        ),
+    ]
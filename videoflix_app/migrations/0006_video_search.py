@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:30
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0005_video_category_created_at_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='video',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='video_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='video_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0006_video_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['updated_at', 'id'], name='video_updated_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videotombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_id_idx'),
+        ),
+    ]
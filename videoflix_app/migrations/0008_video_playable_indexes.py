@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0007_video_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='video',
+            name='video_created_at_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='video',
+            name='video_category_created_at_idx',
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(condition=models.Q(('is_processing', False), ('processing_complete', True)), fields=['-created_at', '-id'], name='video_playable_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(condition=models.Q(('is_processing', False), ('processing_complete', True)), fields=['category', '-created_at', '-id'], name='video_playable_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(condition=models.Q(('processing_complete', False), ('is_processing', True), _connector='OR'), fields=['created_at', 'id'], name='video_pending_created_idx'),
+        ),
+    ]
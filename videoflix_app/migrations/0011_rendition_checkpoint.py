@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0010_video_media_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenditionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=16)),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('completed_at', models.DateTimeField(auto_now=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rendition_checkpoints', to='videoflix_app.video')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('video', 'name'), name='checkpoint_video_name_uniq')],
+            },
+        ),
+    ]
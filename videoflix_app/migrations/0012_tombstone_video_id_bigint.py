@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0011_rendition_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videotombstone',
+            name='video_id',
+            field=models.BigIntegerField(),
+        ),
+    ]
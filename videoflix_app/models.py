@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 import os
 from django.conf import settings
 
@@ -9,9 +11,26 @@ class Profile(models.Model):
     email = models.EmailField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+SEARCH_CONFIG = 'english'
+
+# Videos that can be played back. PENDING is the complement; both are also the
+# conditions of partial indexes, so filters have to use exactly these.
+PLAYABLE = models.Q(processing_complete=True, is_processing=False)
+PENDING = models.Q(processing_complete=False) | models.Q(is_processing=True)
+
+class VideoQuerySet(models.QuerySet):
+    def playable(self):
+        """Videos that finished processing, served by the partial catalog indexes"""
+        return self.filter(PLAYABLE)
+
+    def pending(self):
+        """Videos still waiting for or in processing, served by the pending index"""
+        return self.filter(PENDING)
+
 class Video(models.Model):
     """Video model for storing video information and processing"""
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     title = models.CharField(max_length=255)
     description = models.TextField()
     category = models.CharField(max_length=255)
@@ -28,7 +47,40 @@ class Video(models.Model):
     has_720p = models.BooleanField(default=False)
     has_1080p = models.BooleanField(default=False)
     
+    # Source metadata from ffprobe, filled in before transcoding.
+    duration = models.FloatField(blank=True, null=True)
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    frame_rate = models.FloatField(blank=True, null=True)
+    video_codec = models.CharField(max_length=32, blank=True)
+    audio_codec = models.CharField(max_length=32, blank=True)
+    has_audio = models.BooleanField(blank=True, null=True)
+    
     thumbnail_url = models.URLField(blank=True, null=True)
+    # Generated thumbnail ladder: [{'format', 'width', 'height', 'path'}, ...]
+    thumbnail_variants = models.JSONField(default=list, blank=True)
+    
+    # Maintained by Postgres on every write; title matches rank above description matches.
+    search_vector = models.GeneratedField(
+        expression=SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = VideoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], condition=PLAYABLE, name='video_playable_created_idx'),
+            models.Index(
+                fields=['category', '-created_at', '-id'], condition=PLAYABLE, name='video_playable_category_idx'
+            ),
+            models.Index(fields=['created_at', 'id'], condition=PENDING, name='video_pending_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='video_updated_at_id_idx'),
+            GinIndex(fields=['search_vector'], name='video_search_vector_idx'),
+            GinIndex(fields=['title'], name='video_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
     
     def __str__(self):
         return self.title
@@ -49,4 +101,30 @@ class Video(models.Model):
             resolutions.append('720p')
         if self.has_1080p:
             resolutions.append('1080p')
-        return resolutions
\ No newline at end of file
+        return resolutions
+
+class VideoTombstone(models.Model):
+    """Id of a deleted video, kept for incremental catalog sync"""
+    video_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_id_idx'),
+        ]
+
+class RenditionCheckpoint(models.Model):
+    """
+    A rendition that was encoded completely and moved into place.
+    fingerprint identifies the source file and encoding settings it was made
+    from, so a replaced upload or a changed ladder invalidates it.
+    """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='rendition_checkpoints')
+    name = models.CharField(max_length=16)
+    fingerprint = models.CharField(max_length=32)
+    completed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'name'], name='checkpoint_video_name_uniq'),
+        ]
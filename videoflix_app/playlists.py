@@ -0,0 +1,136 @@
+"""
+Generation of the adaptive-bitrate master playlist from the transcoded renditions.
+"""
+import os
+import logging
+import threading
+from django.conf import settings
+from videoflix_app.ffmpeg import probe
+
+logger = logging.getLogger(__name__)
+
+MASTER_PLAYLIST = 'master.m3u8'
+
+H264_PROFILES = {
+    'Constrained Baseline': '42e0',
+    'Baseline': '4200',
+    'Main': '4d40',
+    'High': '6400',
+}
+
+AAC_PROFILES = {
+    'LC': 'mp4a.40.2',
+    'HE-AAC': 'mp4a.40.5',
+    'HE-AACv2': 'mp4a.40.29',
+}
+
+
+def parse_media_playlist(path):
+    """Return (duration, uri) pairs of the segments in a media playlist"""
+    segments = []
+    duration = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+            elif line and not line.startswith('#') and duration is not None:
+                segments.append((duration, line))
+                duration = None
+    return segments
+
+
+def codec_string(stream):
+    """Return the RFC 6381 codec string of an ffprobe stream, or None if unknown"""
+    codec = stream.get('codec_name')
+    if codec == 'h264':
+        profile = H264_PROFILES.get(stream.get('profile'))
+        level = stream.get('level')
+        if profile and level and level > 0:
+            return f'avc1.{profile}{level:02x}'
+    elif codec == 'aac':
+        return AAC_PROFILES.get(stream.get('profile'))
+    return None
+
+
+def rendition_info(rendition_dir):
+    """
+    Describe one rendition from its files on disk.
+    Bandwidth comes from segment sizes and durations, resolution and codecs
+    from probing the first segment.
+    """
+    segments = parse_media_playlist(os.path.join(rendition_dir, 'index.m3u8'))
+    if not segments:
+        return None
+
+    total_bytes = 0
+    total_duration = 0.0
+    peak = 0
+    for duration, uri in segments:
+        size = os.path.getsize(os.path.join(rendition_dir, uri))
+        total_bytes += size
+        total_duration += duration
+        if duration > 0:
+            peak = max(peak, size * 8 / duration)
+
+    info = {
+        'bandwidth': int(peak),
+        'average_bandwidth': int(total_bytes * 8 / total_duration) if total_duration else int(peak),
+        'resolution': None,
+        'frame_rate': None,
+        'codecs': [],
+    }
+
+    probed = probe(os.path.join(rendition_dir, segments[0][1]))
+    for stream in (probed or {}).get('streams', []):
+        if stream.get('codec_type') == 'video' and stream.get('width'):
+            info['resolution'] = f"{stream['width']}x{stream['height']}"
+            num, _, den = stream.get('avg_frame_rate', '0/0').partition('/')
+            if den and float(den):
+                info['frame_rate'] = float(num) / float(den)
+        codec = codec_string(stream)
+        if codec:
+            info['codecs'].append(codec)
+    return info
+
+
+def build_master_playlist(resolutions, hls_dir):
+    """Return the master playlist text for the given rendition names"""
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for resolution in resolutions:
+        rendition_dir = os.path.join(hls_dir, resolution)
+        try:
+            info = rendition_info(rendition_dir)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read rendition {rendition_dir}: {e}")
+            continue
+        if info is None:
+            continue
+
+        attributes = [f"BANDWIDTH={info['bandwidth']}", f"AVERAGE-BANDWIDTH={info['average_bandwidth']}"]
+        if info['resolution']:
+            attributes.append(f"RESOLUTION={info['resolution']}")
+        if info['frame_rate']:
+            attributes.append(f"FRAME-RATE={info['frame_rate']:.3f}")
+        if info['codecs']:
+            attributes.append(f'CODECS="{",".join(info["codecs"])}"')
+        lines.append('#EXT-X-STREAM-INF:' + ','.join(attributes))
+        lines.append(f'{resolution}/index.m3u8')
+    return '\n'.join(lines) + '\n'
+
+
+def write_master_playlist(video):
+    """
+    Write master.m3u8 next to the renditions of a video and return its path.
+    The file is replaced atomically so readers never see a partial playlist.
+    """
+    hls_dir = os.path.join(settings.MEDIA_ROOT, video.hls_path or os.path.join('videos', f'video_{video.id}'))
+    content = build_master_playlist(video.get_available_resolutions(), hls_dir)
+
+    path = os.path.join(hls_dir, MASTER_PLAYLIST)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    os.makedirs(hls_dir, exist_ok=True)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,150 @@
+"""
+Live transcode progress.
+ffmpeg runs with -progress pipe:1 and its key=value blocks are parsed as they
+arrive. Percent, speed and ETA of every rendition are written to the cache at
+most every TRANSCODE_PROGRESS_INTERVAL seconds. Only the last
+TRANSCODE_STDERR_LINES lines of stderr are kept, for error logs.
+"""
+import collections
+import json
+import subprocess
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from videoflix_app.models import Video
+
+
+def progress_key(video_id, name):
+    return f'transcode:progress:{video_id}:{name}'
+
+
+def set_progress(video_id, names, **state):
+    state['updated_at'] = time.time()
+    cache.set_many({progress_key(video_id, name): state for name in names}, settings.TRANSCODE_PROGRESS_TTL)
+
+
+def clear_progress(video_id, names):
+    cache.delete_many([progress_key(video_id, name) for name in names])
+
+
+def get_progress(video_ids, names):
+    """Return {video_id: {name: state}} for the renditions that have reported"""
+    keys = {progress_key(video_id, name): (video_id, name) for video_id in video_ids for name in names}
+    progress = {video_id: {} for video_id in video_ids}
+    for key, state in cache.get_many(list(keys)).items():
+        video_id, name = keys[key]
+        progress[video_id][name] = state
+    return progress
+
+
+def parse_number(value):
+    """Parse ffmpeg progress values like '1234', '25.0', '1.5x' or 'N/A'"""
+    try:
+        return float(value.rstrip('x'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def progress_state(block, duration):
+    """Turn one -progress block into {'state', 'percent', 'speed', 'fps', 'eta'}"""
+    # out_time_ms is in microseconds as well; older ffmpeg builds only have that one.
+    out_time = parse_number(block.get('out_time_us') or block.get('out_time_ms'))
+    out_time = max(out_time or 0, 0) / 1_000_000
+    speed = parse_number(block.get('speed'))
+    done = block.get('progress') == 'end'
+
+    percent = eta = None
+    if duration:
+        percent = 100.0 if done else round(min(out_time / duration * 100, 100), 1)
+        if speed:
+            eta = 0 if done else round(max(duration - out_time, 0) / speed)
+    return {
+        'state': 'done' if done else 'running',
+        'percent': percent,
+        'speed': speed,
+        'fps': parse_number(block.get('fps')),
+        'eta': eta,
+    }
+
+
+def run_ffmpeg(cmd, video_id, names, duration):
+    """
+    Run an ffmpeg command and report its progress for the named renditions.
+    Returns the exit code and the tail of stderr.
+    """
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors='replace'
+    )
+    stderr_tail = collections.deque(maxlen=settings.TRANSCODE_STDERR_LINES)
+    reader = threading.Thread(target=stderr_tail.extend, args=(process.stderr,), daemon=True)
+    reader.start()
+
+    state = {'state': 'running', 'percent': 0.0 if duration else None, 'speed': None, 'fps': None, 'eta': None}
+    set_progress(video_id, names, **state)
+    block = {}
+    last_report = time.monotonic()
+    try:
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            block[key] = value
+            if key != 'progress':
+                continue
+            state = progress_state(block, duration)
+            block = {}
+            now = time.monotonic()
+            if value == 'end' or now - last_report >= settings.TRANSCODE_PROGRESS_INTERVAL:
+                set_progress(video_id, names, **state)
+                last_report = now
+        returncode = process.wait()
+    except BaseException:
+        # e.g. the RQ job timeout: do not leave ffmpeg running.
+        process.kill()
+        process.wait()
+        set_progress(video_id, names, **dict(state, state='failed', eta=None))
+        raise
+    finally:
+        reader.join()
+
+    if returncode != 0:
+        set_progress(video_id, names, **dict(state, state='failed', eta=None))
+    return returncode, ''.join(stderr_tail)
+
+
+def video_status(video_id, names):
+    """Processing flags and rendition progress of a video, or None if it does not exist"""
+    video = Video.objects.filter(id=video_id).values('id', 'is_processing', 'processing_complete').first()
+    if video is None:
+        return None
+    video['renditions'] = get_progress([video_id], names)[video_id]
+    return video
+
+
+class StatusStream:
+    """
+    Server-sent events for a video's status: the full status whenever it
+    changes, comments as keep-alive in between. Ends once processing is
+    complete or after TRANSCODE_STATUS_STREAM_TIMEOUT; EventSource clients then
+    reconnect by themselves. The async view calls step() every
+    TRANSCODE_PROGRESS_INTERVAL seconds.
+    """
+
+    def __init__(self, video_id, names):
+        self.video_id = video_id
+        self.names = names
+        self.deadline = time.monotonic() + settings.TRANSCODE_STATUS_STREAM_TIMEOUT
+        self.last = None
+        self.started = False
+
+    def step(self):
+        """Return the next chunk and whether the stream ends after it"""
+        status = video_status(self.video_id, self.names)
+        finished = status is None or (status['processing_complete'] and not status['is_processing'])
+        done = finished or time.monotonic() >= self.deadline
+        prefix = '' if self.started else f'retry: {int(settings.TRANSCODE_PROGRESS_INTERVAL * 1000)}\n'
+        self.started = True
+        if status == self.last:
+            return f'{prefix}: keep-alive\n\n', done
+        self.last = status
+        return f'{prefix}data: {json.dumps(status)}\n\n', done
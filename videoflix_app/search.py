@@ -0,0 +1,48 @@
+"""
+Video search shared by the search endpoint and the admin.
+Matches come from the generated search_vector column (GIN index) or from
+trigram word similarity on the title (pg_trgm GIN index). Both conditions are
+queried separately: OR-ed together, the planner underestimates the cost of
+evaluating them per row and falls back to a sequential scan.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q
+from videoflix_app.models import SEARCH_CONFIG
+
+
+def full_text_matches(queryset, term):
+    """Videos whose title or description match term, annotated with rank"""
+    query = SearchQuery(term, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(rank=SearchRank(F('search_vector'), query))
+
+
+def trigram_matches(queryset, term):
+    """Videos with a title word similar to term (typos, prefixes), annotated with similarity"""
+    return queryset.filter(title__trigram_word_similar=term).annotate(
+        similarity=TrigramWordSimilarity(term, 'title')
+    )
+
+
+def search_videos(queryset, term, limit, fields):
+    """
+    Return up to limit rows of .values(*fields) matching term.
+    Full-text matches come first by rank; remaining slots are filled with
+    trigram matches by similarity.
+    """
+    results = list(
+        full_text_matches(queryset, term).order_by('-rank', '-created_at', '-id').values(*fields)[:limit]
+    )
+    if len(results) < limit:
+        found = [row['id'] for row in results]
+        results += trigram_matches(queryset, term).exclude(id__in=found).order_by(
+            '-similarity', '-created_at', '-id'
+        ).values(*fields)[:limit - len(results)]
+    return results
+
+
+def filter_videos(queryset, term):
+    """Filter queryset to all videos search_videos() could return, e.g. for the admin"""
+    return queryset.filter(
+        Q(id__in=full_text_matches(queryset, term).values('id'))
+        | Q(id__in=trigram_matches(queryset, term).values('id'))
+    )
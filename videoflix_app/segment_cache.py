@@ -0,0 +1,333 @@
+"""
+Node-wide cache of hot HLS segments in shared memory.
+Segments are copied into HLS_SEGMENT_CACHE_DIR (a tmpfs such as /dev/shm), which
+every worker process on the node shares through the page cache. Copies keep the
+origin mtime, so ETags do not change when a segment is served from the cache.
+"""
+import fcntl
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from videoflix_app.delivery import get_delivery_backend
+from videoflix_app.models import Video
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = re.compile(r'^(.*?)(\d+)(\.ts)$')
+STATS_VIDEO_COUNT_KEY = 'segment-cache:video-count'
+# Running byte total of the cache directory, written under the eviction lock.
+SIZE_FILE = '.size'
+
+
+def stats_key(kind, movie_id):
+    return f'segment-cache:{kind}:{movie_id}'
+
+
+def stats_slot_key(slot):
+    return f'segment-cache:video-slot:{slot}'
+
+
+class SegmentCache:
+    """
+    Byte-budgeted segment cache shared by all workers on a node.
+    Eviction runs under a file lock: 'lru' drops the least recently used segments,
+    'lfu' drops segments of the least requested videos first (LRU within a video).
+    Misses are admitted in a background thread, which also prefetches the next
+    HLS_SEGMENT_CACHE_PREFETCH segments.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = None
+        self._executor_pid = None
+        self._counters = defaultdict(lambda: [0, 0])
+        self._registered = set()
+        self._last_flush = time.monotonic()
+
+    @property
+    def enabled(self):
+        # Offloading backends hand the web server a path below MEDIA_ROOT and
+        # the web server reads the file itself, so the cache is bypassed.
+        return bool(settings.HLS_SEGMENT_CACHE_DIR) and not getattr(get_delivery_backend(), 'offloads', False)
+
+    def cached_path(self, origin_path):
+        relative_path = os.path.relpath(origin_path, settings.MEDIA_ROOT)
+        return os.path.join(settings.HLS_SEGMENT_CACHE_DIR, relative_path)
+
+    def lookup(self, movie_id, origin_path):
+        """
+        Return the path the segment should be served from.
+        Falls back to origin_path on a miss and schedules admission and prefetch.
+        """
+        if not self.enabled:
+            return origin_path
+
+        cached_path = self.cached_path(origin_path)
+        hit = False
+        try:
+            cached = os.stat(cached_path)
+            origin = os.stat(origin_path)
+            hit = cached.st_size == origin.st_size and cached.st_mtime_ns == origin.st_mtime_ns
+            if hit and time.time() - cached.st_atime > 1:
+                os.utime(cached_path, ns=(time.time_ns(), cached.st_mtime_ns))
+        except OSError:
+            pass
+
+        self._record(movie_id, hit)
+        self._schedule(movie_id, origin_path, [] if hit else [origin_path])
+        return cached_path if hit else origin_path
+
+    def prefetch_playlist(self, movie_id, manifest_path, content):
+        """Prefetch the first segments of a media playlist"""
+        if not self.enabled or not settings.HLS_SEGMENT_CACHE_PREFETCH:
+            return
+        rendition_dir = os.path.dirname(manifest_path)
+        uris = [
+            line for line in content.decode('utf-8', 'ignore').splitlines()
+            if line and not line.startswith('#')
+        ][:settings.HLS_SEGMENT_CACHE_PREFETCH]
+        paths = [os.path.join(rendition_dir, uri) for uri in uris]
+        if paths:
+            self._submit(movie_id, paths)
+
+    def invalidate_video(self, hls_dir):
+        """Drop the cached segments of a video on this node"""
+        if not self.enabled or not hls_dir:
+            return
+        shutil.rmtree(os.path.join(settings.HLS_SEGMENT_CACHE_DIR, hls_dir), ignore_errors=True)
+
+    def stats(self):
+        """Return usage of the cache directory and the per-video hit rates"""
+        self._flush(force=True)
+        data = {
+            'enabled': self.enabled,
+            'policy': settings.HLS_SEGMENT_CACHE_POLICY,
+            'max_bytes': settings.HLS_SEGMENT_CACHE_BYTES,
+            'bytes': 0,
+            'segments': 0,
+            'videos': [],
+        }
+        if not self.enabled:
+            return data
+
+        for _, stat in self._scan():
+            data['bytes'] += stat.st_size
+            data['segments'] += 1
+
+        count = cache.get(STATS_VIDEO_COUNT_KEY) or 0
+        slots = cache.get_many([stats_slot_key(slot) for slot in range(1, count + 1)])
+        video_ids = list(dict.fromkeys(slots.values()))
+        keys = [stats_key(kind, movie_id) for movie_id in video_ids for kind in ('hits', 'misses')]
+        values = cache.get_many(keys)
+        for movie_id in video_ids:
+            hits = values.get(stats_key('hits', movie_id), 0)
+            misses = values.get(stats_key('misses', movie_id), 0)
+            data['videos'].append({
+                'id': movie_id,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            })
+        data['videos'].sort(key=lambda video: video['hits'] + video['misses'], reverse=True)
+        return data
+
+    def _schedule(self, movie_id, origin_path, paths):
+        count = settings.HLS_SEGMENT_CACHE_PREFETCH
+        match = SEGMENT_PATTERN.match(os.path.basename(origin_path))
+        if count and match:
+            prefix, number, suffix = match.groups()
+            directory = os.path.dirname(origin_path)
+            width = len(number)
+            paths = paths + [
+                os.path.join(directory, f'{prefix}{int(number) + offset:0{width}d}{suffix}')
+                for offset in range(1, count + 1)
+            ]
+        if paths:
+            self._submit(movie_id, paths)
+
+    def _submit(self, movie_id, paths):
+        with self._lock:
+            paths = [path for path in paths if path not in self._pending]
+            if not paths:
+                return
+            self._pending.update(paths)
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.HLS_SEGMENT_CACHE_WORKERS, thread_name_prefix='segment-cache'
+                )
+                self._executor_pid = os.getpid()
+            self._executor.submit(self._admit, movie_id, paths)
+
+    def _admit(self, movie_id, paths):
+        admitted = 0
+        try:
+            for origin_path in paths:
+                admitted += self._copy(origin_path)
+            if admitted:
+                self._evict(admitted)
+        except Exception as e:
+            logger.error(f"Error caching segments of video {movie_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.difference_update(paths)
+
+    def _copy(self, origin_path):
+        """Copy a segment into the cache and return the bytes added (0 if it was not copied)"""
+        cached_path = self.cached_path(origin_path)
+        try:
+            origin = os.stat(origin_path)
+        except FileNotFoundError:
+            return 0
+        if origin.st_size > settings.HLS_SEGMENT_CACHE_BYTES // 8:
+            return 0
+        try:
+            cached = os.stat(cached_path)
+            if cached.st_size == origin.st_size and cached.st_mtime_ns == origin.st_mtime_ns:
+                return 0
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        tmp_path = f'{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        shutil.copyfile(origin_path, tmp_path)
+        os.utime(tmp_path, ns=(time.time_ns(), origin.st_mtime_ns))
+        os.replace(tmp_path, cached_path)
+        return origin.st_size
+
+    def _scan(self):
+        for root, _, files in os.walk(settings.HLS_SEGMENT_CACHE_DIR):
+            for name in files:
+                if name.endswith('.tmp') or name in ('.lock', SIZE_FILE):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+    def _evict(self, admitted):
+        """
+        Add admitted bytes to the running total in SIZE_FILE and evict once it
+        is over budget. Only then is the directory walked, which also corrects
+        the total; it can only be too high (replaced or invalidated segments),
+        never too low, so the budget is kept.
+        """
+        budget = settings.HLS_SEGMENT_CACHE_BYTES
+        lock_path = os.path.join(settings.HLS_SEGMENT_CACHE_DIR, '.lock')
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            total = self._read_size()
+            if total is not None and total + admitted <= budget:
+                self._write_size(total + admitted)
+                return
+
+            entries = list(self._scan())
+            total = sum(stat.st_size for _, stat in entries)
+            if total <= budget:
+                self._write_size(total)
+                return
+
+            if settings.HLS_SEGMENT_CACHE_POLICY == 'lfu':
+                frequencies = self._video_frequencies(entries)
+                entries.sort(key=lambda entry: (frequencies.get(self._video_dir(entry[0]), 0), entry[1].st_atime))
+            else:
+                entries.sort(key=lambda entry: entry[1].st_atime)
+
+            # Evict down to 90% so that the next admissions do not evict again right away.
+            target = budget * 0.9
+            for path, stat in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= stat.st_size
+                except FileNotFoundError:
+                    pass
+            self._write_size(total)
+
+    def _read_size(self):
+        try:
+            with open(os.path.join(settings.HLS_SEGMENT_CACHE_DIR, SIZE_FILE)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_size(self, total):
+        with open(os.path.join(settings.HLS_SEGMENT_CACHE_DIR, SIZE_FILE), 'w') as f:
+            f.write(str(total))
+
+    def _video_dir(self, cached_path):
+        relative_path = os.path.relpath(cached_path, settings.HLS_SEGMENT_CACHE_DIR)
+        return os.path.dirname(os.path.dirname(relative_path))
+
+    def _video_frequencies(self, entries):
+        """Request counts per cached video directory, used by the 'lfu' policy"""
+        directories = {self._video_dir(path) for path, _ in entries}
+        # This runs on the admission threads, outside any request: drop their
+        # expired or broken connections like db_task does for RQ jobs.
+        close_old_connections()
+        try:
+            video_ids = dict(
+                Video.objects.filter(hls_path__in=directories).values_list('hls_path', 'id')
+            )
+        finally:
+            close_old_connections()
+        keys = {directory: [stats_key(kind, movie_id) for kind in ('hits', 'misses')]
+                for directory, movie_id in video_ids.items()}
+        values = cache.get_many([key for pair in keys.values() for key in pair])
+        return {
+            directory: sum(values.get(key, 0) for key in pair)
+            for directory, pair in keys.items()
+        }
+
+    def _record(self, movie_id, hit):
+        with self._lock:
+            self._counters[movie_id][0 if hit else 1] += 1
+        self._flush()
+
+    def _flush(self, force=False):
+        """Add the local hit/miss counters to the shared cache every few seconds"""
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.HLS_SEGMENT_CACHE_STATS_INTERVAL:
+            return
+        with self._lock:
+            counters, self._counters = self._counters, defaultdict(lambda: [0, 0])
+            self._last_flush = now
+        if not counters:
+            return
+
+        try:
+            for movie_id in counters:
+                self._register(movie_id)
+            for movie_id, (hits, misses) in counters.items():
+                for kind, value in (('hits', hits), ('misses', misses)):
+                    if value:
+                        cache.add(stats_key(kind, movie_id), 0, None)
+                        cache.incr(stats_key(kind, movie_id), value)
+        except Exception as e:
+            logger.error(f"Error writing segment cache stats: {e}")
+
+    def _register(self, movie_id):
+        """
+        Add a video to the ids reported by stats(). Every id gets its own slot
+        from an atomic counter, so workers flushing at once never overwrite
+        each other's ids; cache.add() makes sure an id is only added once.
+        """
+        if movie_id in self._registered:
+            return
+        if cache.add(stats_key('registered', movie_id), 1, None):
+            cache.add(STATS_VIDEO_COUNT_KEY, 0, None)
+            cache.set(stats_slot_key(cache.incr(STATS_VIDEO_COUNT_KEY)), movie_id, None)
+        self._registered.add(movie_id)
+
+
+segment_cache = SegmentCache()
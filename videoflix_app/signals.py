@@ -1,17 +1,39 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from videoflix_app.models import Video
-from videoflix_app.tasks import convert_video_to_hls, generate_thumbnail
+from videoflix_app.models import Video, VideoTombstone
+from videoflix_app.tasks import convert_video_to_hls, generate_thumbnail, generate_trickplay
+from videoflix_app.cache import manifest_cache, video_locations
+from videoflix_app.catalog import bump_catalog_version
+from videoflix_app.segment_cache import segment_cache
+from videoflix_app.thumbnails import delete_thumbnail_ladder
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 import django_rq
 import logging
 
 logger = logging.getLogger(__name__)
 
+def invalidate_location(video_id):
+    """
+    Drop the cached manifests and location of a video once the transaction
+    commits; before that, a request in between could re-read the old row and
+    cache it for VIDEO_LOCATION_SHARED_TTL.
+    """
+    def invalidate():
+        manifest_cache.invalidate_video(video_id)
+        video_locations.invalidate(video_id)
+    transaction.on_commit(invalidate)
+
 @receiver(post_save, sender=Video)
 def video_post_save(sender, instance, created, **kwargs):
     """
     Process video when it's created or when video_file is added
     """
+    invalidate_location(instance.id)
+    bump_catalog_version()
+    
     if created and instance.video_file:
         logger.info(f"New video created: {instance.title} (ID: {instance.id})")
         
@@ -21,6 +43,8 @@ def video_post_save(sender, instance, created, **kwargs):
             queue.enqueue(generate_thumbnail, instance.id)
             
             queue.enqueue(convert_video_to_hls, instance.id)
+            
+            queue.enqueue(generate_trickplay, instance.id)
         except Exception as e:
             logger.error(f"Failed to queue tasks for video {instance.id}: {e}")
         
@@ -33,6 +57,7 @@ def video_post_save(sender, instance, created, **kwargs):
             queue = django_rq.get_queue('default')
             queue.enqueue(generate_thumbnail, instance.id)
             queue.enqueue(convert_video_to_hls, instance.id)
+            queue.enqueue(generate_trickplay, instance.id)
         except Exception as e:
             logger.error(f"Failed to queue tasks for existing video {instance.id}: {e}")
 
@@ -42,10 +67,20 @@ def video_post_delete(sender, instance, **kwargs):
     Clean up files when video is deleted
     """
     import os
-    from django.conf import settings
     
     logger.info(f"Deleting video: {instance.title} (ID: {instance.id})")
     
+    invalidate_location(instance.id)
+    segment_cache.invalidate_video(instance.hls_path)
+    bump_catalog_version()
+    
+    try:
+        VideoTombstone.objects.create(video_id=instance.id)
+        retention = timezone.now() - timedelta(days=settings.DELTA_SYNC_TOMBSTONE_RETENTION_DAYS)
+        VideoTombstone.objects.filter(deleted_at__lt=retention).delete()
+    except Exception as e:
+        logger.error(f"Error writing tombstone for video {instance.id}: {e}")
+    
     if instance.video_file:
         try:
             instance.video_file.delete(save=False)
@@ -58,6 +93,12 @@ def video_post_delete(sender, instance, **kwargs):
         except Exception as e:
             logger.error(f"Error deleting thumbnail: {e}")
     
+    if instance.thumbnail_variants:
+        try:
+            delete_thumbnail_ladder(instance.thumbnail_variants)
+        except Exception as e:
+            logger.error(f"Error deleting thumbnail variants: {e}")
+    
     if instance.preview_image:
         try:
             instance.preview_image.delete(save=False)
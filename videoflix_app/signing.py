@@ -0,0 +1,67 @@
+"""
+Stateless signatures for HLS segment URLs.
+Authorization happens once when the manifest is requested; segment requests
+only verify the HMAC, without touching the database or the session.
+"""
+import time
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SALT = 'videoflix_app.signing.segment'
+
+
+def _signature(user_id, movie_id, expires):
+    value = f'{user_id}:{movie_id}:{expires}'
+    return salted_hmac(SALT, value, algorithm='sha256').hexdigest()[:32]
+
+
+def make_segment_token(user_id, movie_id, now=None):
+    """
+    Return a token of the form '<user>-<expires>-<signature>' for a video.
+    The expiry is rounded up to a fixed step so that repeated manifest
+    requests get the same token and ETag for a while.
+    """
+    now = int(now if now is not None else time.time())
+    ttl = settings.HLS_SIGNED_URL_TTL
+    step = max(ttl // 4, 1)
+    expires = -(-(now + ttl) // step) * step
+    return f'{user_id}-{expires}-{_signature(user_id, movie_id, expires)}'
+
+
+def verify_segment_token(token, movie_id, now=None):
+    """Return the user id bound to a valid, unexpired token, otherwise None"""
+    try:
+        user_id, expires, signature = token.split('-')
+        user_id = int(user_id)
+        expires = int(expires)
+    except ValueError:
+        return None
+
+    if expires < int(now if now is not None else time.time()):
+        return None
+    if not constant_time_compare(signature, _signature(user_id, movie_id, expires)):
+        return None
+    return user_id
+
+
+def sign_manifest(content, token):
+    """Point every URI line of a media playlist to the signed segment path"""
+    prefix = f'signed/{token}/'.encode('ascii')
+    lines = content.split(b'\n')
+    for index, line in enumerate(lines):
+        if line and not line.startswith(b'#') and line.strip():
+            lines[index] = prefix + line
+    return b'\n'.join(lines)
+
+
+def signed_manifest(entry, user_id, movie_id):
+    """
+    Return (content, etag, last_modified) of a cached manifest for one user.
+    Without Last-Modified a revalidation cannot return a manifest with expired tokens.
+    """
+    if not settings.HLS_SIGNED_URLS:
+        return entry.content, entry.etag, entry.last_modified
+
+    token = make_segment_token(user_id, movie_id)
+    etag = f'{entry.etag[:-1]}-{token.rsplit("-", 1)[1][:8]}"'
+    return sign_manifest(entry.content, token), etag, None
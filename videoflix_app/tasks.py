@@ -1,15 +1,80 @@
+import functools
+import math
 import os
-import subprocess
+import shutil
+import uuid
+import django_rq
 from django.conf import settings
-from videoflix_app.models import Video
+from django.db import close_old_connections
+from django.utils import timezone
+from rq import Retry, get_current_job
+from rq.job import Dependency
+from videoflix_app.models import RenditionCheckpoint, Video
+from videoflix_app.cache import manifest_cache, video_locations
+from videoflix_app.catalog import bump_catalog_version
+from videoflix_app.chunked import transcode_chunked, use_chunked
+from videoflix_app.checkpoints import completed_renditions, publish_rendition, record_checkpoint, staging_dir, sweep_staging
+from videoflix_app.ffmpeg import hls_command, media_metadata, playlist_complete
+from videoflix_app.playlists import write_master_playlist
+from videoflix_app.progress import clear_progress, run_ffmpeg, set_progress
+from videoflix_app.thumbnails import default_variant, delete_thumbnail_ladder, extract_frame, write_thumbnail_ladder
+from videoflix_app.trickplay import write_trickplay
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Video bitrates in kbit/s at REFERENCE_FRAME_RATE
+RENDITIONS = [
+    {'name': '480p', 'scale': '854:480', 'height': 480, 'bitrate': 800},
+    {'name': '720p', 'scale': '1280:720', 'height': 720, 'bitrate': 2500},
+    {'name': '1080p', 'scale': '1920:1080', 'height': 1080, 'bitrate': 5000}
+]
+REFERENCE_FRAME_RATE = 30
+MAX_FRAME_RATE = 120
+
+def db_task(func):
+    """
+    Drop expired or broken database connections around a job, like Django does
+    around requests, so persistent connections are safe in RQ workers.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+def hls_output_dir(video_id):
+    return os.path.join(settings.MEDIA_ROOT, 'videos', 'hls', f'video_{video_id}')
+
+def rendition_ladder(video):
+    """
+    Renditions to encode for a probed video: those at or below the source
+    resolution (at least the smallest one), with bitrates scaled by
+    sqrt(frame_rate / REFERENCE_FRAME_RATE), i.e. about 1.4x for 60 fps.
+    Without metadata the full ladder is used.
+    """
+    source = min(video.width, video.height) if video.width and video.height else None
+    ladder = [res for res in RENDITIONS if source is None or res['height'] <= source] or RENDITIONS[:1]
+    factor = math.sqrt(min(video.frame_rate, MAX_FRAME_RATE) / REFERENCE_FRAME_RATE) if video.frame_rate else 1
+    return [{**res, 'bitrate': round(res['bitrate'] * factor)} for res in ladder]
+
+def transcode_timeout(duration, count):
+    """RQ job timeout for encoding count renditions of a source of duration seconds"""
+    if not duration:
+        return settings.HLS_TRANSCODE_MIN_TIMEOUT
+    return max(settings.HLS_TRANSCODE_MIN_TIMEOUT, int(duration * settings.HLS_TRANSCODE_TIMEOUT_FACTOR * count))
+
+@db_task
 def convert_video_to_hls(video_id):
     """
-    Convert video to HLS format with multiple resolutions
-    This runs as a background task
+    Probe the source and queue the HLS conversion of its rendition ladder.
+    HLS_TRANSCODE_MODE 'single' queues one job for all renditions, 'fanout' one
+    job per rendition so several workers share the video. Job timeouts scale
+    with the source duration. finalize_hls runs once all of them have ended,
+    whether they succeeded or not.
     """
     try:
         video = Video.objects.get(id=video_id)
@@ -17,103 +82,212 @@ def convert_video_to_hls(video_id):
             logger.error(f"No video file found for video {video_id}")
             return
         
-        video.is_processing = True
-        video.save()
+        # Probe once; the ladder, job timeouts and the API use the stored metadata.
+        metadata = media_metadata(video.video_file.path) or {}
+        Video.objects.filter(id=video_id).update(is_processing=True, updated_at=timezone.now(), **metadata)
+        for field, value in metadata.items():
+            setattr(video, field, value)
+        bump_catalog_version()
         
-        video_name = os.path.splitext(os.path.basename(video.video_file.name))[0]
-        output_dir = os.path.join(settings.MEDIA_ROOT, 'videos', 'hls', f'video_{video_id}')
-        os.makedirs(output_dir, exist_ok=True)
+        names = [res['name'] for res in rendition_ladder(video)]
+        for res in RENDITIONS:
+            if res['name'] not in names:
+                shutil.rmtree(os.path.join(hls_output_dir(video_id), res['name']), ignore_errors=True)
+        RenditionCheckpoint.objects.filter(video_id=video_id).exclude(name__in=names).delete()
+        batches = [[name] for name in names] if settings.HLS_TRANSCODE_MODE == 'fanout' else [names]
+        clear_progress(video_id, [res['name'] for res in RENDITIONS])
+        set_progress(video_id, names, state='queued', percent=None, speed=None, fps=None, eta=None)
         
-        input_path = video.video_file.path
-        
-        resolutions = [
-            {'name': '480p', 'scale': '854:480', 'bitrate': '800k'},
-            {'name': '720p', 'scale': '1280:720', 'bitrate': '2500k'},
-            {'name': '1080p', 'scale': '1920:1080', 'bitrate': '5000k'}
+        queue = django_rq.get_queue('default')
+        jobs = [
+            queue.enqueue(
+                transcode_renditions, video_id, batch,
+                job_timeout=transcode_timeout(video.duration, len(batch)),
+                retry=Retry(max=len(settings.TRANSCODE_RETRY_INTERVALS), interval=settings.TRANSCODE_RETRY_INTERVALS)
+                if settings.TRANSCODE_RETRY_INTERVALS else None
+            )
+            for batch in batches
         ]
+        queue.enqueue(finalize_hls, video_id, depends_on=Dependency(jobs=jobs, allow_failure=True))
+        logger.info(f"Queued {len(jobs)} transcode jobs for video {video_id}")
         
-        for res in resolutions:
-            try:
-                output_path = os.path.join(output_dir, res['name'])
-                os.makedirs(output_path, exist_ok=True)
-                
-                cmd = [
-                    'ffmpeg', '-i', input_path,
-                    '-vf', f"scale={res['scale']}",
-                    '-c:v', 'libx264',
-                    '-b:v', res['bitrate'],
-                    '-c:a', 'aac',
-                    '-hls_time', '6',
-                    '-hls_playlist_type', 'vod',
-                    '-hls_segment_filename', os.path.join(output_path, 'segment_%03d.ts'),
-                    os.path.join(output_path, 'index.m3u8')
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    if res['name'] == '480p':
-                        video.has_480p = True
-                    elif res['name'] == '720p':
-                        video.has_720p = True
-                    elif res['name'] == '1080p':
-                        video.has_1080p = True
-                    
-                    logger.info(f"Successfully converted {res['name']} for video {video_id}")
-                else:
-                    logger.error(f"FFmpeg error for {res['name']}: {result.stderr}")
-                    
-            except Exception as e:
-                logger.error(f"Error converting {res['name']} for video {video_id}: {e}")
+    except Video.DoesNotExist:
+        logger.error(f"Video {video_id} not found")
+    except Exception as e:
+        logger.error(f"Error processing video {video_id}: {e}")
+        Video.objects.filter(id=video_id).update(is_processing=False, updated_at=timezone.now())
+
+@db_task
+def transcode_renditions(video_id, names):
+    """
+    Encode the named renditions of a video in one ffmpeg pass.
+    Renditions checkpointed for the current source are skipped, the others are
+    encoded into a staging directory and published when complete. Failures are
+    raised, so RQ retries the job with TRANSCODE_RETRY_INTERVALS backoff.
+    """
+    try:
+        video = Video.objects.get(id=video_id)
+        output_dir = hls_output_dir(video_id)
+        renditions = [res for res in rendition_ladder(video) if res['name'] in names]
+        
+        done = completed_renditions(video, renditions, output_dir)
+        if done:
+            logger.info(f"Skipping checkpointed {', '.join(sorted(done))} for video {video_id}")
+            set_progress(video_id, done, state='done', percent=100.0, speed=None, fps=None, eta=0)
+        renditions = [res for res in renditions if res['name'] not in done]
+        if not renditions:
+            return
+        
+        sweep_staging(output_dir, transcode_timeout(video.duration, len(RENDITIONS)))
+        job = get_current_job()
+        staging = staging_dir(output_dir, names, job.id if job else uuid.uuid4().hex)
+        # RQ keeps the job id across retries, so a run killed without reaching
+        # the cleanup below leaves its directory to the retry of the same job.
+        shutil.rmtree(staging, ignore_errors=True)
+        for res in renditions:
+            os.makedirs(os.path.join(staging, res['name']))
+        
+        try:
+            todo = [res['name'] for res in renditions]
+            audio = video.has_audio is not False
+            if use_chunked(video.duration):
+                # Long sources: keyframe-aligned pieces encoded by a pool of ffmpeg processes.
+                transcode_chunked(
+                    video.video_file.path, staging, renditions, video.duration, audio,
+                    on_progress=lambda state: set_progress(video_id, todo, **state)
+                )
+            else:
+                # One ffmpeg process decodes the source once and encodes all renditions.
+                cmd = hls_command(video.video_file.path, staging, renditions, audio=audio)
+                returncode, stderr = run_ffmpeg(cmd, video_id, todo, video.duration)
+                if returncode != 0:
+                    logger.error(f"FFmpeg error for {', '.join(todo)} of video {video_id}: {stderr}")
+                    raise RuntimeError(f"ffmpeg exited with status {returncode}")
+            
+            for res in renditions:
+                if not playlist_complete(os.path.join(staging, res['name'], 'index.m3u8')):
+                    raise RuntimeError(f"Rendition {res['name']} was not completed")
+                publish_rendition(staging, output_dir, res['name'])
+                record_checkpoint(video, res)
+            logger.info(f"Successfully converted {', '.join(todo)} for video {video_id}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            
+    except Video.DoesNotExist:
+        logger.error(f"Video {video_id} not found")
+    except Exception as e:
+        logger.error(f"Error converting {', '.join(names)} for video {video_id}: {e}")
+        raise
+
+@db_task
+def finalize_hls(video_id):
+    """
+    Publish the renditions once every transcode job has ended: write the master
+    playlist, then set hls_path, the has_* flags and processing_complete in one
+    UPDATE. Only these columns are written, so fields saved concurrently by the
+    thumbnail and trick-play jobs are kept. A video without any completed
+    rendition is left pending.
+    """
+    try:
+        video = Video.objects.get(id=video_id)
+        output_dir = hls_output_dir(video_id)
+        ladder = rendition_ladder(video)
+        names = {res['name'] for res in ladder}
+        completed = completed_renditions(video, ladder, output_dir)
+        flags = {}
+        for res in RENDITIONS:
+            if res['name'] in names and res['name'] not in completed:
+                logger.error(f"Rendition {res['name']} missing for video {video_id}")
+            flags[f"has_{res['name']}"] = res['name'] in completed
         
         video.hls_path = f'videos/hls/video_{video_id}'
-        video.is_processing = False
-        video.processing_complete = True
-        video.save()
+        for name, done in flags.items():
+            setattr(video, name, done)
+        if completed:
+            try:
+                write_master_playlist(video)
+            except Exception as e:
+                logger.error(f"Error writing master playlist for video {video_id}: {e}")
+        else:
+            # Without a single rendition the video stays pending instead of
+            # being listed as playable with nothing to play.
+            logger.error(f"No rendition completed for video {video_id}")
         
+        Video.objects.filter(id=video_id).update(
+            hls_path=video.hls_path,
+            is_processing=False,
+            processing_complete=bool(completed),
+            updated_at=timezone.now(),
+            **flags
+        )
+        # update() sends no post_save, so invalidate like the signal handler does.
+        manifest_cache.invalidate_video(video_id)
+        video_locations.invalidate(video_id)
+        bump_catalog_version()
         logger.info(f"Video processing completed for video {video_id}")
         
     except Video.DoesNotExist:
         logger.error(f"Video {video_id} not found")
     except Exception as e:
-        logger.error(f"Error processing video {video_id}: {e}")
-        try:
-            video = Video.objects.get(id=video_id)
-            video.is_processing = False
-            video.save()
-        except:
-            pass
+        logger.error(f"Error finalizing video {video_id}: {e}")
+        Video.objects.filter(id=video_id).update(is_processing=False, updated_at=timezone.now())
+
+@db_task
+def generate_master_playlist(video_id):
+    """Write master.m3u8 for a video converted before master playlists existed"""
+    try:
+        video = Video.objects.get(id=video_id)
+        if video.get_available_resolutions():
+            write_master_playlist(video)
+            logger.info(f"Master playlist written for video {video_id}")
+    except Video.DoesNotExist:
+        logger.error(f"Video {video_id} not found")
+    except Exception as e:
+        logger.error(f"Error writing master playlist for video {video_id}: {e}")
 
+@db_task
 def generate_thumbnail(video_id):
-    """Generate thumbnail for video"""
+    """Generate the thumbnail ladder (WebP and JPEG in several widths) for video"""
     try:
         video = Video.objects.get(id=video_id)
         if not video.video_file:
             return
         
-        input_path = video.video_file.path
-        thumbnail_dir = os.path.join(settings.MEDIA_ROOT, 'videos', 'thumbnails')
-        os.makedirs(thumbnail_dir, exist_ok=True)
-        
-        thumbnail_path = os.path.join(thumbnail_dir, f'video_{video_id}_thumb.jpg')
+        frame = extract_frame(video.video_file.path)
+        variants = write_thumbnail_ladder(video_id, frame)
         
-        cmd = [
-            'ffmpeg', '-i', input_path,
-            '-ss', '00:00:10', 
-            '-vframes', '1',
-            '-vf', 'scale=640:360',
-            thumbnail_path, '-y'
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        stale = [variant for variant in video.thumbnail_variants if variant not in variants]
+        delete_thumbnail_ladder(stale)
         
-        if result.returncode == 0:
-            relative_path = os.path.relpath(thumbnail_path, settings.MEDIA_ROOT)
-            video.thumbnail_image = relative_path
-            video.save()
-            logger.info(f"Thumbnail generated for video {video_id}")
-        else:
-            logger.error(f"Thumbnail generation failed for video {video_id}: {result.stderr}")
+        fields = {'thumbnail_variants': variants}
+        default = default_variant(variants)
+        if default:
+            fields['thumbnail_image'] = default['path']
+        # update() writes only the thumbnail columns: a save() of this instance
+        # would overwrite what the transcode jobs wrote meanwhile, and its
+        # post_save would queue the processing again.
+        Video.objects.filter(id=video_id).update(updated_at=timezone.now(), **fields)
+        bump_catalog_version()
+        logger.info(f"Thumbnails generated for video {video_id}: {len(variants)} variants")
             
     except Exception as e:
         logger.error(f"Error generating thumbnail for video {video_id}: {e}")
+
+@db_task
+def generate_trickplay(video_id):
+    """Generate trick-play sprite sheets and their WebVTT track for video"""
+    try:
+        video = Video.objects.get(id=video_id)
+        if not video.video_file:
+            return
+        
+        hls_dir = video.hls_path or f'videos/hls/video_{video_id}'
+        preview_path = write_trickplay(video_id, video.video_file.path, hls_dir)
+        if preview_path:
+            # update() skips post_save, which would otherwise re-queue processing
+            # for a video whose HLS conversion is still running.
+            Video.objects.filter(id=video_id).update(preview_image=preview_path, updated_at=timezone.now())
+            logger.info(f"Trick-play sprites generated for video {video_id}")
+            
+    except Exception as e:
+        logger.error(f"Error generating trick-play sprites for video {video_id}: {e}")
@@ -1,3 +1,53 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from videoflix_app import tasks
+from videoflix_app.checkpoints import staging_dir
+from videoflix_app.models import RenditionCheckpoint, Video
 
-# Create your tests here.
+
+def fake_ffmpeg(cmd, video_id, names, duration):
+    """Write complete playlists where the HLS muxer would, instead of encoding"""
+    output_dir = os.path.dirname(os.path.dirname(cmd[-1]))
+    for name in names:
+        with open(os.path.join(output_dir, name, 'index.m3u8'), 'w', encoding='utf-8') as f:
+            f.write('#EXTM3U\n#EXTINF:6.0,\nsegment_000.ts\n#EXT-X-ENDLIST\n')
+    return 0, ''
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TranscodeRetryTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root, TRANSCODE_CHUNKED_MIN_DURATION=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        os.makedirs(os.path.join(self.media_root, 'videos', 'originals'))
+        with open(os.path.join(self.media_root, 'videos', 'originals', 'source.mp4'), 'wb') as f:
+            f.write(b'source')
+        # Set the file with update(), so post_save does not queue the processing.
+        self.video = Video.objects.create(title='Video', description='Description', category='Drama')
+        Video.objects.filter(id=self.video.id).update(
+            video_file='videos/originals/source.mp4', width=854, height=480, frame_rate=30
+        )
+
+    def test_retry_reuses_staging_left_by_killed_run(self):
+        output_dir = tasks.hls_output_dir(self.video.id)
+        leftover = os.path.join(staging_dir(output_dir, ['480p'], 'job-1'), '480p')
+        os.makedirs(leftover)
+        with open(os.path.join(leftover, 'segment_000.ts'), 'wb') as f:
+            f.write(b'partial')
+
+        with mock.patch.object(tasks, 'get_current_job', return_value=mock.Mock(id='job-1')), \
+                mock.patch.object(tasks, 'run_ffmpeg', side_effect=fake_ffmpeg):
+            # __wrapped__ skips db_task, which would close the test transaction's connection.
+            tasks.transcode_renditions.__wrapped__(self.video.id, ['480p'])
+
+        self.assertTrue(os.path.isfile(os.path.join(output_dir, '480p', 'index.m3u8')))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, '480p', 'segment_000.ts')))
+        self.assertFalse(os.path.exists(staging_dir(output_dir, ['480p'], 'job-1')))
+        self.assertTrue(RenditionCheckpoint.objects.filter(video=self.video, name='480p').exists())
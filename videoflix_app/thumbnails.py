@@ -0,0 +1,88 @@
+"""
+Thumbnail ladder: several widths in WebP and JPEG, resized with Pillow from a
+single frame that ffmpeg decodes once.
+"""
+import io
+import os
+import subprocess
+import logging
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = os.path.join('videos', 'thumbnails')
+ASPECT_RATIO = 16 / 9
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'extension': 'webp', 'options': {'method': 4}},
+    'jpeg': {'format': 'JPEG', 'extension': 'jpg', 'options': {'optimize': True, 'progressive': True}},
+}
+
+
+def extract_frame(input_path, position=10):
+    """
+    Decode one frame at position seconds (or the first frame of shorter videos)
+    and return it as a Pillow image. Seeking before -i only decodes from the
+    preceding keyframe.
+    """
+    for seek in (position, 0):
+        cmd = [
+            'ffmpeg', '-v', 'error', '-ss', str(seek), '-i', input_path,
+            '-frames:v', '1', '-f', 'image2pipe', '-vcodec', 'bmp', '-'
+        ]
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode == 0 and result.stdout:
+            image = Image.open(io.BytesIO(result.stdout))
+            image.load()
+            return image.convert('RGB')
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', 'replace'))
+    raise RuntimeError(f'No frame could be decoded from {input_path}')
+
+
+def ladder_widths(source_width):
+    """Widths to generate: no upscaling, except for the default width clients rely on"""
+    default = settings.THUMBNAIL_DEFAULT_WIDTH
+    return sorted({width for width in settings.THUMBNAIL_WIDTHS if width <= source_width} | {default})
+
+
+def write_thumbnail_ladder(video_id, frame):
+    """
+    Write every width in every format and return the variant set, a list of
+    {'format', 'width', 'height', 'path'} dicts with paths relative to MEDIA_ROOT.
+    """
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, THUMBNAIL_DIR), exist_ok=True)
+    variants = []
+    for width in ladder_widths(frame.width):
+        height = round(width / ASPECT_RATIO)
+        image = ImageOps.fit(frame, (width, height), Image.LANCZOS)
+        for name, spec in FORMATS.items():
+            path = os.path.join(THUMBNAIL_DIR, f"video_{video_id}_{width}w.{spec['extension']}")
+            full_path = os.path.join(settings.MEDIA_ROOT, path)
+            tmp_path = f'{full_path}.{os.getpid()}.tmp'
+            image.save(
+                tmp_path,
+                spec['format'],
+                quality=settings.THUMBNAIL_QUALITY[name],
+                **spec['options']
+            )
+            os.replace(tmp_path, full_path)
+            variants.append({'format': name, 'width': width, 'height': height, 'path': path})
+    return variants
+
+
+def default_variant(variants):
+    """The JPEG at THUMBNAIL_DEFAULT_WIDTH, kept in thumbnail_image for older clients"""
+    for variant in variants:
+        if variant['format'] == 'jpeg' and variant['width'] == settings.THUMBNAIL_DEFAULT_WIDTH:
+            return variant
+    return None
+
+
+def delete_thumbnail_ladder(variants):
+    for variant in variants or []:
+        try:
+            os.remove(os.path.join(settings.MEDIA_ROOT, variant['path']))
+        except FileNotFoundError:
+            pass
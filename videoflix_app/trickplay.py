@@ -0,0 +1,108 @@
+"""
+Trick-play previews for scrubbing: frames taken every TRICKPLAY_INTERVAL seconds
+in one ffmpeg pass, tiled into JPEG sprite sheets with Pillow, plus a WebVTT
+track that maps each time range to a tile (#xywh=) of a sheet.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import logging
+from django.conf import settings
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+TRICKPLAY_DIR = 'trickplay'
+TRICKPLAY_VTT = 'thumbnails.vtt'
+CONTENT_TYPES = {
+    '.vtt': 'text/vtt; charset=utf-8',
+    '.jpg': 'image/jpeg',
+}
+
+
+def extract_frames(input_path, output_dir):
+    """Write one scaled frame per interval as BMP files and return their paths in order"""
+    cmd = [
+        'ffmpeg', '-v', 'error', '-i', input_path,
+        '-vf', f"fps=1/{settings.TRICKPLAY_INTERVAL},scale={settings.TRICKPLAY_WIDTH}:-2",
+        '-an', '-sn',
+        os.path.join(output_dir, 'frame_%05d.bmp')
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return sorted(
+        os.path.join(output_dir, name) for name in os.listdir(output_dir) if name.startswith('frame_')
+    )
+
+
+def vtt_timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f'{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}'
+
+
+def build_sprites(frame_paths, output_dir):
+    """
+    Tile the frames into sprite sheets in output_dir and return the WebVTT track.
+    Frames are opened one at a time, so memory stays at one sheet.
+    """
+    columns = settings.TRICKPLAY_COLUMNS
+    per_sheet = columns * settings.TRICKPLAY_ROWS
+    interval = settings.TRICKPLAY_INTERVAL
+    cues = ['WEBVTT', '']
+
+    for sheet_index, start in enumerate(range(0, len(frame_paths), per_sheet)):
+        sheet_frames = frame_paths[start:start + per_sheet]
+        sheet = None
+        name = f'sprite_{sheet_index:03d}.jpg'
+        for tile, frame_path in enumerate(sheet_frames):
+            with Image.open(frame_path) as frame:
+                if sheet is None:
+                    width, height = frame.size
+                    rows = -(-len(sheet_frames) // columns)
+                    sheet = Image.new('RGB', (width * min(columns, len(sheet_frames)), height * rows))
+                x, y = (tile % columns) * width, (tile // columns) * height
+                sheet.paste(frame, (x, y))
+
+            number = start + tile
+            cues += [
+                f'{vtt_timestamp(number * interval)} --> {vtt_timestamp((number + 1) * interval)}',
+                f'{name}#xywh={x},{y},{width},{height}',
+                ''
+            ]
+        sheet.save(os.path.join(output_dir, name), 'JPEG', quality=settings.TRICKPLAY_QUALITY, optimize=True)
+
+    return '\n'.join(cues)
+
+
+def write_trickplay(video_id, input_path, hls_dir):
+    """
+    Generate sprites and thumbnails.vtt into <hls_dir>/trickplay and return the
+    path of the first sprite relative to MEDIA_ROOT (None for an empty video).
+    The directory is built aside and swapped in, so players never see a mix.
+    """
+    target = os.path.join(settings.MEDIA_ROOT, hls_dir, TRICKPLAY_DIR)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f'.{TRICKPLAY_DIR}-', dir=os.path.dirname(target))
+    try:
+        with tempfile.TemporaryDirectory() as frame_dir:
+            frame_paths = extract_frames(input_path, frame_dir)
+            if not frame_paths:
+                logger.warning(f"No trick-play frames extracted for video {video_id}")
+                return None
+            vtt = build_sprites(frame_paths, build_dir)
+        with open(os.path.join(build_dir, TRICKPLAY_VTT), 'w', encoding='utf-8') as f:
+            f.write(vtt)
+        os.chmod(build_dir, 0o755)
+
+        old_dir = f'{build_dir}.old'
+        if os.path.isdir(target):
+            os.replace(target, old_dir)
+        os.replace(build_dir, target)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    return os.path.join(hls_dir, TRICKPLAY_DIR, 'sprite_000.jpg')